@@ -0,0 +1,99 @@
+# bench_backends.py - Compare the in-memory and SQLite repositories
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import operations
+import repository
+
+WORDS = ["python", "history", "garden", "river", "night", "empire", "code",
+         "secret", "ocean", "winter", "machine", "story", "light", "war"]
+AUTHORS = ["Jane Smith", "John Doe", "Ada Lovelace", "Mary Shelley",
+           "Isaac Asimov", "Toni Morrison", "Chinua Achebe", "Ursula Le Guin"]
+
+def make_workload(num_books, num_members, num_ops, seed=1):
+    """Build the same list of calls for every backend"""
+    rng = random.Random(seed)
+    books = []
+    for i in range(num_books):
+        title = " ".join(rng.choice(WORDS).title() for _ in range(3))
+        books.append((f"B{i:08d}", title, rng.choice(AUTHORS),
+                      rng.choice(operations.genres), rng.randint(1, 5)))
+    members = [(f"M{i:08d}", f"Member {i}", f"member{i}@example.com")
+               for i in range(num_members)]
+    circulation = []
+    for _ in range(num_ops):
+        member_id = rng.choice(members)[0]
+        isbn = rng.choice(books)[0]
+        circulation.append((member_id, isbn))
+    searches = [rng.choice(WORDS + AUTHORS)[:rng.randint(3, 8)] for _ in range(num_ops // 10 or 1)]
+    return books, members, circulation, searches
+
+def run(repo, workload):
+    books, members, circulation, searches = workload
+    timings = {}
+
+    start = time.perf_counter()
+    for book in books:
+        repo.add_book(*book)
+    timings["add_book"] = (len(books), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for member in members:
+        repo.add_member(*member)
+    timings["add_member"] = (len(members), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for member_id, isbn in circulation:
+        repo.borrow_book(member_id, isbn)
+    timings["borrow_book"] = (len(circulation), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for member_id, isbn in circulation:
+        repo.return_book(member_id, isbn)
+    timings["return_book"] = (len(circulation), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for keyword in searches:
+        repo.search_books(keyword)
+    timings["search_books"] = (len(searches), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for book in books[:len(circulation)]:
+        repo.update_book(book[0], total_copies=book[4] + 1)
+    timings["update_book"] = (min(len(books), len(circulation)), time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the in-memory and SQLite repositories")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=20000)
+    args = parser.parse_args()
+
+    workload = make_workload(args.books, args.members, args.ops)
+    results = {}
+
+    operations.books.clear()
+    operations.members.clear()
+    operations.rebuild_indexes()
+    results["memory"] = run(repository.open_repository("memory"), workload)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = repository.open_repository("sqlite", os.path.join(tmp, "bench.db"))
+        results["sqlite"] = run(repo, workload)
+        repo.close()
+
+    print(f"{'operation':<14}{'memory ops/s':>16}{'sqlite ops/s':>16}")
+    for op in results["memory"]:
+        row = f"{op:<14}"
+        for backend in ("memory", "sqlite"):
+            count, elapsed = results[backend][op]
+            row += f"{count / elapsed if elapsed else float('inf'):>16,.0f}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
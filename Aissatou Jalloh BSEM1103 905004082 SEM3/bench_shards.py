@@ -0,0 +1,79 @@
+# bench_shards.py - Search throughput of ShardedCatalog by number of shards
+#
+#   python bench_shards.py --books 200000 --shards 1 2 4 8
+#
+# Shards only speed up searches when there are free cores to run them on;
+# the report includes this machine's core count for that reason.
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+import operations
+from sharded import ShardedCatalog
+
+WORDS = ["python", "history", "garden", "river", "night", "empire", "code",
+         "secret", "ocean", "winter", "machine", "story", "light", "war"]
+
+def make_books(count, seed):
+    rng = random.Random(seed)
+    return [(f"S{i:09d}", " ".join(rng.choice(WORDS).title() for _ in range(3)),
+             f"Author {rng.randrange(count // 10 + 1)}", rng.choice(operations.genres),
+             rng.randint(1, 4))
+            for i in range(count)]
+
+def measure(catalog, keywords, duration, full):
+    """Searches per second, run back to back for `duration`.
+
+    By default each search asks for the first ranked page, as demo.py does;
+    every shard still scans all of its candidates. With `full` the whole
+    result list is returned, which mostly measures sending it back.
+    """
+    done = 0
+    results = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        keyword = keywords[done % len(keywords)]
+        if full:
+            results += len(catalog.search_books(keyword))
+        else:
+            results += len(catalog.search_books_page(keyword, 10, ranked=True)[0])
+        done += 1
+    elapsed = time.perf_counter() - start
+    return round(done / elapsed, 1), results // max(done, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Search throughput by shard count")
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--full", action="store_true", help="time unpaged searches")
+    args = parser.parse_args()
+
+    books = make_books(args.books, args.seed)
+    rng = random.Random(args.seed)
+    keywords = [rng.choice(WORDS)[:rng.randint(2, 4)] for _ in range(100)]
+    report = {"books": args.books, "cores": multiprocessing.cpu_count(), "runs": []}
+    for shards in args.shards:
+        # The result cache is off so every search really scans its shard
+        with ShardedCatalog(shards, cache_entries=0) as catalog:
+            start = time.perf_counter()
+            catalog.add_books_bulk(books)
+            load_seconds = time.perf_counter() - start
+            searches_per_sec, average_results = measure(catalog, keywords, args.duration, args.full)
+        report["runs"].append({
+            "shards": shards,
+            "load_seconds": round(load_seconds, 2),
+            "searches_per_sec": searches_per_sec,
+            "average_results": average_results,
+        })
+    base = report["runs"][0]["searches_per_sec"]
+    for run in report["runs"]:
+        run["speedup"] = round(run["searches_per_sec"] / base, 2) if base else None
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
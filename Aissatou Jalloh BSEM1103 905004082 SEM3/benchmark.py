@@ -0,0 +1,170 @@
+# benchmark.py - Reproducible timings for every operation in operations.py
+#
+#   python benchmark.py --scale 10000                 # print a JSON report
+#   python benchmark.py --scale 10000 --save-baseline # record this machine's numbers
+#   python benchmark.py --scale 10000 --check         # fail if slower than the baseline
+#
+# Timings only compare on the machine that recorded them, so the baseline
+# file is local (ignored by git). Save it from an unchanged tree before
+# starting work; a change that makes an operation slower should say why in
+# its commit, not re-record the baseline to hide it.
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+import operations
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+WORDS = ["python", "history", "garden", "river", "night", "empire", "code",
+         "secret", "ocean", "winter", "machine", "story", "light", "war"]
+
+def reset():
+    operations.books.clear()
+    operations.members.clear()
+    operations.rebuild_indexes()
+
+def make_data(scale, seed):
+    rng = random.Random(seed)
+    books = []
+    for i in range(scale):
+        title = " ".join(rng.choice(WORDS).title() for _ in range(3))
+        books.append((f"B{i:010d}", title, f"Author {rng.randrange(scale // 10 + 1)}",
+                      rng.choice(operations.genres), rng.randint(1, 4)))
+    members = [(f"M{i:010d}", f"Member {i}", f"member{i}@example.com")
+               for i in range(max(1, scale // 4))]
+    return books, members, rng
+
+def timed(calls):
+    """Run each (function, args) pair; returns per-call latencies in seconds"""
+    latencies = []
+    clock = time.perf_counter
+    for function, args in calls:
+        start = clock()
+        function(*args)
+        latencies.append(clock() - start)
+    return latencies
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    total = sum(latencies)
+    def pct(fraction):
+        return latencies[min(count - 1, int(fraction * count))] * 1e6
+    return {
+        "calls": count,
+        "ops_per_sec": round(count / total, 1) if total else None,
+        "p50_us": round(pct(0.50), 2),
+        "p90_us": round(pct(0.90), 2),
+        "p99_us": round(pct(0.99), 2),
+        "max_us": round(latencies[-1] * 1e6, 2),
+    }
+
+def run(scale, seed=1, sample=10000):
+    """Time each operation; at most `sample` calls for the per-call ones"""
+    reset()
+    books, members, rng = make_data(scale, seed)
+    ops = operations
+    results = {}
+
+    results["add_book"] = timed((ops.add_book, book) for book in books)
+    results["add_member"] = timed((ops.add_member, member) for member in members)
+
+    keywords = [rng.choice(WORDS)[:rng.randint(2, 6)] for _ in range(min(sample, 200))]
+    results["search_books"] = timed((ops.search_books, (k,)) for k in keywords)
+
+    pairs = [(rng.choice(members)[0], rng.choice(books)[0]) for _ in range(min(sample, scale))]
+    results["borrow_book"] = timed((ops.borrow_book, pair) for pair in pairs)
+    results["return_book"] = timed((ops.return_book, pair) for pair in pairs)
+
+    updates = rng.sample(books, min(sample, scale))
+    results["update_book"] = timed(
+        (lambda isbn, title: ops.update_book(isbn, title=title), (b[0], b[1] + " Revised"))
+        for b in updates)
+
+    doomed_books = rng.sample(books, min(sample, scale))
+    results["delete_book"] = timed((ops.delete_book, (b[0],)) for b in doomed_books)
+    doomed_members = rng.sample(members, min(sample, len(members)))
+    results["delete_member"] = timed((ops.delete_member, (m[0],)) for m in doomed_members)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    report = {
+        "scale": scale,
+        "python": sys.version.split()[0],
+        "machine": f"{platform.node()} {platform.machine()}",
+        "peak_memory_bytes": peak_bytes,
+        "operations": {name: summarize(lat) for name, lat in results.items()},
+    }
+    reset()
+    return report
+
+def compare(report, baseline, tolerance):
+    """Return a list of regressions: ops whose median latency grew by more than
+    `tolerance`. Medians are used because a single GC pause skews the mean."""
+    regressions = []
+    for name, stats in report["operations"].items():
+        expected = baseline["operations"].get(name)
+        if not expected or not expected["p50_us"]:
+            continue
+        ratio = stats["p50_us"] / expected["p50_us"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {stats['p50_us']:,.2f}us vs baseline "
+                               f"{expected['p50_us']:,.2f}us ({ratio:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every operation in operations.py")
+    parser.add_argument("--scale", type=int, default=10000,
+                        help="number of books (members are a quarter of this); 1000 to 10000000")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample", type=int, default=10000,
+                        help="calls timed for borrow/return/update/delete")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed median latency growth before --check fails")
+    args = parser.parse_args()
+
+    report = run(args.scale, args.seed, args.sample)
+    print(json.dumps(report, indent=2))
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+    key = str(args.scale)
+
+    if args.save_baseline:
+        baselines[key] = report
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline for scale {key} to {args.baseline}", file=sys.stderr)
+    elif args.check:
+        if key not in baselines:
+            sys.exit(f"No baseline for scale {key} in {args.baseline}; record one on this "
+                     f"machine first with --scale {key} --save-baseline")
+        recorded = baselines[key]
+        for field in ("machine", "python"):
+            if recorded.get(field) != report[field]:
+                sys.exit(f"The scale {key} baseline was recorded with {field} "
+                         f"{recorded.get(field)!r}, not {report[field]!r}; "
+                         f"record a new one with --save-baseline")
+        regressions = compare(report, baselines[key], args.tolerance)
+        if regressions:
+            print("PERFORMANCE REGRESSION:", file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions against the scale {key} baseline.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# catalog_snapshot.py - Read-only binary catalog that is used straight from mmap
+#
+#   python catalog_snapshot.py build library_data catalog.bin
+#   python catalog_snapshot.py verify catalog.bin
+#   python catalog_snapshot.py search catalog.bin python
+#
+# Layout (all integers little-endian, every section 8-byte aligned):
+#   header   magic, version, book count, index slots, crc32 of everything
+#            after the header, then the file offset of each section below
+#   strings  heap offsets: book i's ISBN, title and author are the heap
+#            bytes between entries 3i, 3i+1, 3i+2 and 3i+3
+#   text     offsets into the search text, count + 1 entries
+#   genres, total_copies, available_copies   one fixed-width entry per book
+#   index    open-addressing hash table, crc32(ISBN) -> book number + 1
+#   heap     the UTF-8 ISBNs, titles and authors
+#   search   lowercased "title\0author\0" per book, scanned with mmap.find
+#
+# Opening a snapshot only reads the header. Lookups and searches work on
+# the mapped pages and decode just the books they return, so processes that
+# open the same file share one copy in the page cache and can serve at once.
+
+import itertools
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+
+import operations
+
+MAGIC = b"LIBCAT01"
+VERSION = 1
+SECTIONS = ("strings", "text", "genres", "total_copies", "available_copies",
+            "index", "heap", "search")
+HEADER = struct.Struct("<8sIIII" + "Q" * len(SECTIONS))
+SEPARATOR = b"\0"
+
+def _align(size):
+    return (size + 7) & ~7
+
+def _slot_count(count):
+    # A power of two at least twice the book count keeps probe chains short
+    slots = 8
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+def build_snapshot(path, books=None):
+    """Write the catalog (operations.books by default) to `path` atomically.
+
+    Returns the number of books written.
+    """
+    # One C-level copy, so other threads can't resize books mid-build
+    books = dict(operations.books if books is None else books)
+    strings = array("Q", [0])
+    text_offsets = array("Q", [0])
+    genres = array("B")
+    total = array("I")
+    available = array("I")
+    heap = bytearray()
+    search = bytearray()
+    for isbn, book in books.items():
+        for value in (isbn, book["title"], book["author"]):
+            heap += str(value).encode()
+            strings.append(len(heap))
+        search += (book["title"].lower().encode() + SEPARATOR
+                   + book["author"].lower().encode() + SEPARATOR)
+        text_offsets.append(len(search))
+        genres.append(operations._genre_codes[book["genre"]])
+        total.append(book["total_copies"])
+        available.append(book["available_copies"])
+
+    slots = _slot_count(len(books))
+    index = array("I", bytes(4 * slots))
+    for number, isbn in enumerate(books):
+        slot = zlib.crc32(str(isbn).encode()) & (slots - 1)
+        while index[slot]:
+            slot = (slot + 1) & (slots - 1)
+        index[slot] = number + 1
+
+    sections = [_little_endian(strings), _little_endian(text_offsets), genres.tobytes(),
+                _little_endian(total), _little_endian(available), _little_endian(index),
+                bytes(heap), bytes(search)]
+    body = bytearray()
+    positions = []
+    for data in sections:
+        body += bytes(_align(len(body)) - len(body))
+        positions.append(HEADER.size + len(body))
+        body += data
+    header = HEADER.pack(MAGIC, VERSION, len(books), slots, zlib.crc32(body), *positions)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(books)
+
+class CatalogSnapshot:
+    """A snapshot file opened read-only through mmap.
+
+    Answers the catalog's read operations (ISBN lookup, search_books,
+    search_books_page) with the same results operations.py would give for
+    the catalog the snapshot was built from.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError(f"{path}: not a catalog snapshot")
+        magic, version, self.count, self.slots, self.checksum, *positions = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path}: not a version {VERSION} catalog snapshot")
+        self._positions = dict(zip(SECTIONS, positions))
+        view = memoryview(self._map)
+        count = self.count
+        self._strings = self._column(view, "strings", "Q", 3 * count + 1)
+        self._text = self._column(view, "text", "Q", count + 1)
+        self._genres = self._column(view, "genres", "B", count)
+        self._total = self._column(view, "total_copies", "I", count)
+        self._available = self._column(view, "available_copies", "I", count)
+        self._index = self._column(view, "index", "I", self.slots)
+        self._heap = self._positions["heap"]
+        self._search = self._positions["search"]
+        self._search_end = self._search + self._text[count]
+
+    def _column(self, view, name, typecode, length):
+        start = self._positions[name]
+        size = array(typecode).itemsize * length
+        if sys.byteorder != "little" and typecode != "B":
+            # Big-endian machines get a swapped private copy
+            values = array(typecode)
+            values.frombytes(view[start:start + size])
+            values.byteswap()
+            return values
+        return view[start:start + size].cast(typecode)
+
+    def close(self):
+        for column in (self._strings, self._text, self._genres, self._total,
+                       self._available, self._index):
+            if isinstance(column, memoryview):
+                column.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, number, field):
+        i = 3 * number + field
+        start = self._heap + self._strings[i]
+        return self._map[start:self._heap + self._strings[i + 1]].decode()
+
+    def _find(self, isbn):
+        key = str(isbn).encode()
+        slot = zlib.crc32(key) & (self.slots - 1)
+        while True:
+            entry = self._index[slot]
+            if not entry:
+                return None
+            number = entry - 1
+            i = 3 * number
+            if self._map[self._heap + self._strings[i]:self._heap + self._strings[i + 1]] == key:
+                return number
+            slot = (slot + 1) & (self.slots - 1)
+
+    def __contains__(self, isbn):
+        return self._find(isbn) is not None
+
+    def get(self, isbn, default=None):
+        """The book's fields as a dict, like dict(operations.books[isbn])"""
+        number = self._find(isbn)
+        if number is None:
+            return default
+        return self._record(number)
+
+    def _record(self, number):
+        return {
+            "title": self._string(number, 1),
+            "author": self._string(number, 2),
+            "genre": operations.genres[self._genres[number]],
+            "total_copies": self._total[number],
+            "available_copies": self._available[number],
+        }
+
+    def _result(self, number):
+        result = {"isbn": self._string(number, 0)}
+        result.update(self._record(number))
+        return result
+
+    def isbns(self):
+        return (self._string(number, 0) for number in range(self.count))
+
+    def _matches(self, keyword):
+        """Book numbers whose title or author contains `keyword`, in order"""
+        if not keyword:
+            yield from range(self.count)
+            return
+        needle = keyword.encode()
+        if SEPARATOR in needle:
+            return
+        position = self._search
+        while True:
+            position = self._map.find(needle, position, self._search_end)
+            if position < 0:
+                return
+            number = bisect_right(self._text, position - self._search) - 1
+            yield number
+            # One hit per book: continue from the start of the next book
+            position = self._search + self._text[number + 1]
+
+    def _ordered(self, keyword, ranked):
+        """Book numbers of the results, in result order"""
+        keyword = keyword.lower()
+        numbers = self._matches(keyword)
+        if ranked:
+            ranks = [(operations._match_rank(keyword, self._record(number)), number)
+                     for number in numbers]
+            numbers = (number for _, number in sorted(ranks))
+        return numbers
+
+    def iter_search_books(self, keyword, ranked=False):
+        for number in self._ordered(keyword, ranked):
+            yield self._result(number)
+
+    def search_books_page(self, keyword, limit=10, cursor=None, ranked=False):
+        """Same (results, next_cursor) contract as operations.search_books_page"""
+        offset = operations.page_offset(cursor)
+        # Skipped rows stay book numbers; only the page is decoded
+        numbers = list(itertools.islice(self._ordered(keyword, ranked),
+                                        offset, offset + limit + 1))
+        page = [self._result(number) for number in numbers[:limit]]
+        if len(numbers) > limit:
+            return page, str(offset + limit)
+        return page, None
+
+    def search_books(self, keyword):
+        return list(self.iter_search_books(keyword))
+
+def open_snapshot(path):
+    return CatalogSnapshot(path)
+
+def verify_snapshot(path, books=None):
+    """Return a list of problems with the file (empty when it is sound).
+
+    With `books`, also check that the snapshot holds exactly that catalog.
+    """
+    try:
+        snapshot = CatalogSnapshot(path)
+    except (OSError, ValueError, struct.error) as error:
+        return [str(error)]
+    problems = []
+    with snapshot:
+        if zlib.crc32(snapshot._map[HEADER.size:]) != snapshot.checksum:
+            return ["checksum mismatch"]
+        strings, text = snapshot._strings, snapshot._text
+        if any(strings[i] > strings[i + 1] for i in range(len(strings) - 1)) \
+                or any(text[i] > text[i + 1] for i in range(len(text) - 1)):
+            problems.append("string offsets are not in order")
+        if any(code >= len(operations.genres) for code in snapshot._genres):
+            problems.append("unknown genre code")
+        if sum(1 for entry in snapshot._index if entry) != snapshot.count:
+            problems.append("index does not hold every book once")
+        for number, isbn in enumerate(snapshot.isbns()):
+            if snapshot._find(isbn) != number:
+                problems.append(f"index lookup for {isbn} is wrong")
+                break
+        if books is not None:
+            if list(snapshot.isbns()) != list(books):
+                problems.append("ISBNs differ from the catalog")
+            else:
+                for isbn, book in books.items():
+                    if snapshot.get(isbn) != dict(book):
+                        problems.append(f"book {isbn} differs from the catalog")
+                        break
+    return problems
+
+def main():
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Build, verify and query catalog snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="snapshot the catalog in a storage directory")
+    build.add_argument("data_dir")
+    build.add_argument("path")
+    verify = commands.add_parser("verify")
+    verify.add_argument("path")
+    verify.add_argument("--data-dir", help="also compare with this storage directory")
+    search = commands.add_parser("search")
+    search.add_argument("path")
+    search.add_argument("keyword")
+    args = parser.parse_args()
+
+    if args.command in ("build", "verify") and getattr(args, "data_dir", None):
+        import storage
+        storage.open_storage(args.data_dir).close()
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_snapshot(args.path)
+        print(f"Wrote {count} books to {args.path} in {time.perf_counter() - start:.3f}s")
+    elif args.command == "verify":
+        problems = verify_snapshot(args.path, operations.books if args.data_dir else None)
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit(1)
+        print(f"{args.path} is sound.")
+    else:
+        start = time.perf_counter()
+        with open_snapshot(args.path) as snapshot:
+            results = snapshot.search_books(args.keyword)
+            elapsed = time.perf_counter() - start
+            for result in results:
+                print(f"{result['isbn']}: {result['title']} by {result['author']}")
+        print(f"{len(results)} results in {elapsed:.3f}s (including open)")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 # demo.py - Interactive Library Management System
+#
+#   python demo.py                        menu-driven session
+#   python demo.py commands.txt           run a command file, then exit
+#   generate_commands | python demo.py -  run commands read from a pipe
+#
+# Modules are imported where they are first needed, so `--help` and short
+# scripts don't pay for anything they don't use.
 
-import operations
+PAGE_SIZE = 10
+DATA_DIR = "library_data"
 
 def menu():
     print("\n--- Mini Library Management System ---")
@@ -17,211 +25,385 @@ def menu():
     print("11. Display All Members")
     print("12. Exit")
 
+def more_results():
+    """Pause between pages of a listing; False stops it"""
+    return input("Press Enter for more, or q to stop: ").strip().lower() != 'q'
+
+def ask_table_format():
+    return input("Show as a table? (y/N): ").strip().lower() == 'y'
+
 def display_all_books():
     """Display all books in the system"""
+    import operations
+    import render
     books = operations.get_all_books()
     if not books:
         print("No books in the system.")
         return
     
+    table = ask_table_format()
     print("\n--- All Books ---")
-    for isbn, book in books.items():
-        print(f"ISBN: {isbn}")
-        print(f"  Title: {book['title']}")
-        print(f"  Author: {book['author']}")
-        print(f"  Genre: {book['genre']}")
-        print(f"  Copies: {book['available_copies']}/{book['total_copies']} available")
-        print()
+    render.show_books(books, table=table, pause=more_results)
 
 def display_all_members():
     """Display all members in the system"""
+    import operations
+    import render
     members = operations.get_all_members()
     if not members:
         print("No members in the system.")
         return
     
+    table = ask_table_format()
     print("\n--- All Members ---")
-    for member in members:
-        print(f"ID: {member['member_id']}")
-        print(f"  Name: {member['name']}")
-        print(f"  Email: {member['email']}")
-        print(f"  Borrowed Books: {len(member['borrowed_books'])}")
-        if member['borrowed_books']:
-            for isbn in member['borrowed_books']:
-                book_title = operations.books[isbn]['title'] if isbn in operations.books else "Unknown Book"
-                print(f"    - {isbn}: {book_title}")
-        print()
-
-while True:
-    menu()
-    choice = input("Select an option: ")
-
-    if choice == "1":
-        print("\n--- Add New Book ---")
-        isbn = input("Enter ISBN: ")
-        title = input("Enter Title: ")
-        author = input("Enter Author: ")
-        print(f"Available genres: {operations.genres}")
-        genre = input("Enter Genre: ")
-        total = int(input("Enter Total Copies: "))
-        success, message = operations.add_book(isbn, title, author, genre, total)
-        print(f"Result: {message}")
-
-    elif choice == "2":
-        print("\n--- Add New Member ---")
-        member_id = input("Enter Member ID: ")
-        name = input("Enter Name: ")
-        email = input("Enter Email: ")
-        success, message = operations.add_member(member_id, name, email)
-        print(f"Result: {message}")
-
-    elif choice == "3":
-        print("\n--- Search Books ---")
-        keyword = input("Enter search keyword (title or author): ")
-        results = operations.search_books(keyword)
-        if results:
-            print(f"\nFound {len(results)} book(s):")
-            for book in results:
-                print(f"ISBN: {book['isbn']}")
-                print(f"Title: {book['title']}")
-                print(f"Author: {book['author']}")
-                print(f"Genre: {book['genre']}")
-                print(f"Available: {book['available_copies']}/{book['total_copies']}")
-                print()
+    render.show_members(members, operations.books, table=table, pause=more_results)
+
+# Script mode runs one command per line, split like a shell command line.
+# Arguments after the positional ones are field=value pairs:
+#   add_book 001 "Python Basics" "Jane Smith" Non-Fiction 3
+#   update_book 001 total_copies=5   # comments and blank lines are skipped
+#   borrow_book M001 001
+# Each command is the operations.py function of that name; the tuple
+# converts its positional arguments.
+SCRIPT_COMMANDS = {
+    "add_book": (str, str, str, str, int),
+    "add_member": (str, str, str),
+    "update_book": (str,),
+    "update_member": (str,),
+    "delete_book": (str,),
+    "delete_member": (str,),
+    "borrow_book": (str, str),
+    "return_book": (str, str),
+    "place_hold": (str, str),
+    "cancel_hold": (str, str),
+    "search_books": (str,),
+    "fuzzy_search_books": (str,),
+    "filter_books": (),
+    "get_all_books": (),
+    "get_all_members": (),
+    "circulation_stats": (),
+    "most_borrowed": (),
+    "most_active_members": (),
+}
+FIELD_TYPES = {"total_copies": int, "limit": int, "max_distance": int,
+               "min_copies": int, "max_copies": int, "due": float,
+               "available": lambda value: value.lower() in ("1", "true", "yes", "y")}
+
+def _strip_comment(line):
+    # A comment starts at an unquoted "#" that begins a word, so
+    # C#Basics and bob#1@x.com stay intact
+    quote = None
+    previous = " "
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "#" and previous.isspace():
+            return line[:index]
+        previous = char
+    return line
+
+def parse_command(line):
+    """(name, args, kwargs) for one script line, or None for a blank line.
+
+    Raises ValueError for unknown commands and bad arguments.
+    """
+    import shlex
+    words = shlex.split(_strip_comment(line))
+    if not words:
+        return None
+    name, words = words[0], words[1:]
+    if name not in SCRIPT_COMMANDS:
+        raise ValueError(f"unknown command {name!r}")
+    converters = SCRIPT_COMMANDS[name]
+    if len(words) < len(converters):
+        raise ValueError(f"{name} needs {len(converters)} arguments")
+    args = [convert(word) for convert, word in zip(converters, words)]
+    kwargs = {}
+    for word in words[len(converters):]:
+        field, equals, value = word.partition("=")
+        if not equals:
+            raise ValueError(f"expected field=value, got {word!r}")
+        kwargs[field] = FIELD_TYPES.get(field, str)(value)
+    return name, args, kwargs
+
+def _write_result(result, out):
+    import operations
+    import render
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], str):
+        out.write(result[1] + "\n")
+    elif result is operations.books:
+        render.write_paged(render.book_rows(result), out=out)
+    elif result is operations.members:
+        render.write_paged(render.member_rows(result), out=out)
+    elif isinstance(result, list) and result and isinstance(result[0], dict):
+        # search results carry their ISBN
+        render.write_paged(render.book_rows({book["isbn"]: book for book in result}), out=out)
+    else:
+        out.write(f"{result}\n")
+
+def run_script(lines, out=None, quiet=False):
+    """Run script lines against operations.py without prompting.
+
+    Returns counters: commands run, how many succeeded or were refused
+    (a False result such as "No copies available."), and how many were
+    errors (bad lines or exceptions, reported on stderr with line numbers).
+    """
+    import sys
+    import time
+    import operations
+    out = out or sys.stdout
+    counts = {"commands": 0, "succeeded": 0, "failed": 0, "errors": 0}
+    start = time.perf_counter()
+    for number, line in enumerate(lines, 1):
+        try:
+            command = parse_command(line)
+            if command is None:
+                continue
+            name, args, kwargs = command
+            result = getattr(operations, name)(*args, **kwargs)
+        except Exception as error:
+            counts["errors"] += 1
+            sys.stderr.write(f"line {number}: {type(error).__name__}: {error}\n")
+            continue
+        if isinstance(result, tuple) and result and result[0] is False:
+            counts["failed"] += 1
         else:
-            print("No books found.")
+            counts["succeeded"] += 1
+        if not quiet:
+            _write_result(result, out)
+    out.flush()
+    counts["commands"] = counts["succeeded"] + counts["failed"] + counts["errors"]
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+def _read_lines(path):
+    import sys
+    if path == "-":
+        yield from sys.stdin
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from f
+
+def interactive():
+    """The menu loop; returns when the user picks Exit"""
+    import operations
+    while True:
+        menu()
+        choice = input("Select an option: ")
+
+        if choice == "1":
+            print("\n--- Add New Book ---")
+            isbn = input("Enter ISBN: ")
+            title = input("Enter Title: ")
+            author = input("Enter Author: ")
+            print(f"Available genres: {operations.genres}")
+            genre = input("Enter Genre: ")
+            total = int(input("Enter Total Copies: "))
+            success, message = operations.add_book(isbn, title, author, genre, total)
+            print(f"Result: {message}")
+
+        elif choice == "2":
+            print("\n--- Add New Member ---")
+            member_id = input("Enter Member ID: ")
+            name = input("Enter Name: ")
+            email = input("Enter Email: ")
+            success, message = operations.add_member(member_id, name, email)
+            print(f"Result: {message}")
+
+        elif choice == "3":
+            print("\n--- Search Books ---")
+            keyword = input("Enter search keyword (title or author): ")
+            results, cursor = operations.search_books_page(keyword, limit=PAGE_SIZE, ranked=True)
+            if not results:
+                # Allow for typos before giving up
+                results = operations.fuzzy_search_books(keyword, limit=PAGE_SIZE)
+                if results:
+                    print("No exact matches. Closest spellings:")
+                else:
+                    print("No books found.")
+            shown = 0
+            while results:
+                print(f"\nResults {shown + 1}-{shown + len(results)}:")
+                for book in results:
+                    print(f"ISBN: {book['isbn']}")
+                    print(f"Title: {book['title']}")
+                    print(f"Author: {book['author']}")
+                    print(f"Genre: {book['genre']}")
+                    print(f"Available: {book['available_copies']}/{book['total_copies']}")
+                    print()
+                shown += len(results)
+                if cursor is None:
+                    break
+                more = input("Press Enter for more results, or q to stop: ").strip().lower()
+                if more == 'q':
+                    break
+                results, cursor = operations.search_books_page(keyword, limit=PAGE_SIZE,
+                                                               cursor=cursor, ranked=True)
 
-    elif choice == "4":
-        print("\n--- Update Book ---")
-        isbn = input("Enter ISBN of book to update: ")
+        elif choice == "4":
+            print("\n--- Update Book ---")
+            isbn = input("Enter ISBN of book to update: ")
         
-        # Check if book exists
-        if isbn not in operations.books:
-            print("Book not found!")
-            continue
+            # Check if book exists
+            if isbn not in operations.books:
+                print("Book not found!")
+                continue
             
-        current_book = operations.books[isbn]
-        print(f"Current details: {current_book}")
+            current_book = operations.books[isbn]
+            print(f"Current details: {current_book}")
         
-        print("\nEnter new values (press Enter to keep current):")
-        title = input(f"Title [{current_book['title']}]: ").strip()
-        author = input(f"Author [{current_book['author']}]: ").strip()
-        genre = input(f"Genre [{current_book['genre']}]: ").strip()
-        copies = input(f"Total Copies [{current_book['total_copies']}]: ").strip()
+            print("\nEnter new values (press Enter to keep current):")
+            title = input(f"Title [{current_book['title']}]: ").strip()
+            author = input(f"Author [{current_book['author']}]: ").strip()
+            genre = input(f"Genre [{current_book['genre']}]: ").strip()
+            copies = input(f"Total Copies [{current_book['total_copies']}]: ").strip()
         
-        updates = {}
-        if title: updates['title'] = title
-        if author: updates['author'] = author
-        if genre: updates['genre'] = genre
-        if copies: 
-            try:
-                updates['total_copies'] = int(copies)
-            except ValueError:
-                print("Error: Copies must be a number")
-                continue
+            updates = {}
+            if title: updates['title'] = title
+            if author: updates['author'] = author
+            if genre: updates['genre'] = genre
+            if copies: 
+                try:
+                    updates['total_copies'] = int(copies)
+                except ValueError:
+                    print("Error: Copies must be a number")
+                    continue
         
-        if updates:
-            success, message = operations.update_book(isbn, **updates)
-            print(f"Result: {message}")
-        else:
-            print("No changes made.")
+            if updates:
+                success, message = operations.update_book(isbn, **updates)
+                print(f"Result: {message}")
+            else:
+                print("No changes made.")
 
-    elif choice == "5":
-        print("\n--- Update Member ---")
-        member_id = input("Enter Member ID to update: ")
+        elif choice == "5":
+            print("\n--- Update Member ---")
+            member_id = input("Enter Member ID to update: ")
         
-        # Find member
-        member = None
-        for m in operations.members:
-            if m['member_id'] == member_id:
-                member = m
-                break
+            # Find member
+            member = operations.find_member(member_id)
                 
-        if not member:
-            print("Member not found!")
-            continue
+            if not member:
+                print("Member not found!")
+                continue
             
-        print(f"Current details: {member}")
+            print(f"Current details: {member}")
         
-        print("\nEnter new values (press Enter to keep current):")
-        name = input(f"Name [{member['name']}]: ").strip()
-        email = input(f"Email [{member['email']}]: ").strip()
+            print("\nEnter new values (press Enter to keep current):")
+            name = input(f"Name [{member['name']}]: ").strip()
+            email = input(f"Email [{member['email']}]: ").strip()
         
-        updates = {}
-        if name: updates['name'] = name
-        if email: updates['email'] = email
+            updates = {}
+            if name: updates['name'] = name
+            if email: updates['email'] = email
         
-        if updates:
-            success, message = operations.update_member(member_id, **updates)
-            print(f"Result: {message}")
-        else:
-            print("No changes made.")
+            if updates:
+                success, message = operations.update_member(member_id, **updates)
+                print(f"Result: {message}")
+            else:
+                print("No changes made.")
 
-    elif choice == "6":
-        print("\n--- Delete Book ---")
-        isbn = input("Enter ISBN of book to delete: ")
+        elif choice == "6":
+            print("\n--- Delete Book ---")
+            isbn = input("Enter ISBN of book to delete: ")
         
-        # Show book details before deletion
-        if isbn in operations.books:
-            book = operations.books[isbn]
-            print(f"Book to delete: {book['title']} by {book['author']}")
-            confirm = input("Are you sure? (y/N): ").strip().lower()
-            if confirm == 'y':
-                success, message = operations.delete_book(isbn)
-                print(f"Result: {message}")
+            # Show book details before deletion
+            if isbn in operations.books:
+                book = operations.books[isbn]
+                print(f"Book to delete: {book['title']} by {book['author']}")
+                confirm = input("Are you sure? (y/N): ").strip().lower()
+                if confirm == 'y':
+                    success, message = operations.delete_book(isbn)
+                    print(f"Result: {message}")
+                else:
+                    print("Deletion cancelled.")
             else:
-                print("Deletion cancelled.")
-        else:
-            print("Book not found!")
+                print("Book not found!")
 
-    elif choice == "7":
-        print("\n--- Delete Member ---")
-        member_id = input("Enter Member ID to delete: ")
+        elif choice == "7":
+            print("\n--- Delete Member ---")
+            member_id = input("Enter Member ID to delete: ")
         
-        # Find member
-        member = None
-        for m in operations.members:
-            if m['member_id'] == member_id:
-                member = m
-                break
+            # Find member
+            member = operations.find_member(member_id)
                 
-        if not member:
-            print("Member not found!")
-            continue
+            if not member:
+                print("Member not found!")
+                continue
             
-        print(f"Member to delete: {member['name']} ({member['email']})")
-        print(f"Borrowed books: {len(member['borrowed_books'])}")
+            print(f"Member to delete: {member['name']} ({member['email']})")
+            print(f"Borrowed books: {len(member['borrowed_books'])}")
         
-        confirm = input("Are you sure? (y/N): ").strip().lower()
-        if confirm == 'y':
-            success, message = operations.delete_member(member_id)
+            confirm = input("Are you sure? (y/N): ").strip().lower()
+            if confirm == 'y':
+                success, message = operations.delete_member(member_id)
+                print(f"Result: {message}")
+            else:
+                print("Deletion cancelled.")
+
+        elif choice == "8":
+            print("\n--- Borrow Book ---")
+            member_id = input("Enter Member ID: ")
+            isbn = input("Enter ISBN: ")
+            success, message = operations.borrow_book(member_id, isbn)
+            print(f"Result: {message}")
+
+        elif choice == "9":
+            print("\n--- Return Book ---")
+            member_id = input("Enter Member ID: ")
+            isbn = input("Enter ISBN: ")
+            success, message = operations.return_book(member_id, isbn)
             print(f"Result: {message}")
-        else:
-            print("Deletion cancelled.")
 
-    elif choice == "8":
-        print("\n--- Borrow Book ---")
-        member_id = input("Enter Member ID: ")
-        isbn = input("Enter ISBN: ")
-        success, message = operations.borrow_book(member_id, isbn)
-        print(f"Result: {message}")
+        elif choice == "10":
+            display_all_books()
 
-    elif choice == "9":
-        print("\n--- Return Book ---")
-        member_id = input("Enter Member ID: ")
-        isbn = input("Enter ISBN: ")
-        success, message = operations.return_book(member_id, isbn)
-        print(f"Result: {message}")
+        elif choice == "11":
+            display_all_members()
 
-    elif choice == "10":
-        display_all_books()
+        elif choice == "12":
+            print("Exiting system. Goodbye!")
+            return
 
-    elif choice == "11":
-        display_all_members()
+        else:
+            print("Invalid option. Please try again.")
 
-    elif choice == "12":
-        print("Exiting system. Goodbye!")
-        break
+def main(argv=None):
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Mini Library Management System")
+    parser.add_argument("scripts", nargs="*", metavar="FILE",
+                        help="command files to run instead of the menu ('-' reads standard input)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="print only errors and the summary")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--no-save", action="store_true",
+                        help="start empty and keep everything in memory")
+    args = parser.parse_args(argv)
 
-    else:
-        print("Invalid option. Please try again.")
\ No newline at end of file
+    store = None
+    if not args.no_save:
+        import storage
+        # Restore the previous session and keep logging changes until exit
+        store = storage.open_storage(args.data_dir)
+    try:
+        if not args.scripts:
+            interactive()
+            return 0
+        totals = {"commands": 0, "succeeded": 0, "failed": 0, "errors": 0, "seconds": 0.0}
+        for path in args.scripts:
+            counts = run_script(_read_lines(path), quiet=args.quiet)
+            for key in totals:
+                totals[key] += counts[key]
+        sys.stderr.write(f"{totals['commands']} commands in {totals['seconds']:.3f}s: "
+                         f"{totals['succeeded']} succeeded, {totals['failed']} failed, "
+                         f"{totals['errors']} errors\n")
+        return 1 if totals["errors"] else 0
+    finally:
+        if store is not None:
+            store.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+# import_export.py - Streaming CSV/JSONL import and export of books and members
+
+import csv
+import json
+import os
+from collections import Counter
+
+import operations
+
+BOOK_COLUMNS = ("isbn", "title", "author", "genre", "total_copies", "available_copies")
+MEMBER_COLUMNS = ("member_id", "name", "email", "borrowed_books")
+WRITE_CHUNK_SIZE = 5000
+
+def _format(path, file_format):
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; pass file_format")
+
+def read_rows(path, file_format=None):
+    """Yield one dict per CSV row or JSONL line, never reading the whole file"""
+    file_format = _format(path, file_format)
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def _member_loans(row):
+    """(borrow, member_id, isbn) steps that restore one member row's loans"""
+    borrowed = row.get("borrowed_books") or []
+    if isinstance(borrowed, str):
+        borrowed = [isbn for isbn in borrowed.split(";") if isbn]
+    return [("borrow", row.get("member_id"), isbn) for isbn in borrowed]
+
+def import_books(path, file_format=None):
+    """Add every book in the file; returns a Counter of status messages.
+
+    Imported books start with all copies available. Loans are restored by
+    importing members afterwards.
+    """
+    counts = Counter()
+    for chunk in _chunked(read_rows(path, file_format), operations.BULK_CHUNK_SIZE):
+        for status in operations.add_books_bulk(chunk):
+            counts[operations.STATUS_MESSAGES[status]] += 1
+    return counts
+
+def import_members(path, file_format=None):
+    """Add every member in the file and re-borrow their borrowed_books.
+
+    Returns a Counter of status messages for the members, plus the loan
+    results counted under "Loan: <message>". Loans are only restored for
+    members the import added, never for one that already existed.
+    """
+    counts = Counter()
+    for chunk in _chunked(read_rows(path, file_format), operations.BULK_CHUNK_SIZE):
+        loans = []
+        for row, status in zip(chunk, operations.add_members_bulk(chunk)):
+            counts[operations.STATUS_MESSAGES[status]] += 1
+            if status == operations.STATUS_OK:
+                loans.extend(_member_loans(row))
+        for status in operations.apply_circulation_batch(loans):
+            counts["Loan: " + operations.STATUS_MESSAGES[status]] += 1
+    return counts
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _iter_books():
+    # Copy the keys only, so other threads can keep adding books meanwhile
+    for isbn in list(operations.books):
+        book = operations.books.get(isbn)
+        if book is not None:
+            yield isbn, book
+
+def _book_csv_row(isbn, book):
+    return (isbn, book["title"], book["author"], book["genre"],
+            book["total_copies"], book["available_copies"])
+
+def _book_json_line(isbn, book, dumps=json.dumps):
+    return (f'{{"isbn":{dumps(isbn)},"title":{dumps(book["title"])},'
+            f'"author":{dumps(book["author"])},"genre":{dumps(book["genre"])},'
+            f'"total_copies":{book["total_copies"]},'
+            f'"available_copies":{book["available_copies"]}}}\n')
+
+def _member_csv_row(member):
+    return (member["member_id"], member["name"], member["email"],
+            ";".join(member["borrowed_books"]))
+
+def _member_json_line(member, dumps=json.dumps):
+    return (f'{{"member_id":{dumps(member["member_id"])},"name":{dumps(member["name"])},'
+            f'"email":{dumps(member["email"])},'
+            f'"borrowed_books":{dumps(member["borrowed_books"])}}}\n')
+
+def _write(path, file_format, columns, records, csv_row, json_line):
+    file_format = _format(path, file_format)
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for chunk in _chunked(records, WRITE_CHUNK_SIZE):
+                writer.writerows(csv_row(*record) for record in chunk)
+                written += len(chunk)
+        else:
+            for chunk in _chunked(records, WRITE_CHUNK_SIZE):
+                f.write("".join(json_line(*record) for record in chunk))
+                written += len(chunk)
+    return written
+
+def export_books(path, file_format=None):
+    """Stream every book to a CSV or JSONL file; returns the number written"""
+    return _write(path, file_format, BOOK_COLUMNS, _iter_books(),
+                  _book_csv_row, _book_json_line)
+
+def export_members(path, file_format=None):
+    """Stream every member to a CSV or JSONL file; returns the number written"""
+    records = ((member,) for member in list(operations.get_all_members()))
+    return _write(path, file_format, MEMBER_COLUMNS, records,
+                  _member_csv_row, _member_json_line)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import or export library data")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("kind", choices=["books", "members"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--data-dir", default="library_data",
+                        help="storage directory to load from and save to")
+    args = parser.parse_args()
+
+    import storage
+    store = storage.open_storage(args.data_dir)
+    try:
+        if args.action == "export":
+            export = export_books if args.kind == "books" else export_members
+            print(f"Exported {export(args.path, args.format)} {args.kind}.")
+        else:
+            load = import_books if args.kind == "books" else import_members
+            for message, count in load(args.path, args.format).items():
+                print(f"{count}: {message}")
+    finally:
+        store.close()
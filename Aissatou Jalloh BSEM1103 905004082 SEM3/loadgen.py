@@ -0,0 +1,168 @@
+# loadgen.py - Async load generator for server.py
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import operations
+
+SEARCH_WORDS = ["python", "history", "river", "smith", "night", "ocean", "code"]
+
+class Client:
+    """One connection that pipelines requests and matches responses by id"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.waiting = {}
+        self.listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response["id"], None)
+            if future is not None:
+                future.set_result(response)
+
+    def call(self, op, *args, **kwargs):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        request = {"id": request_id, "op": op, "args": args, "kwargs": kwargs}
+        self.writer.write(json.dumps(request, separators=(",", ":")).encode() + b"\n")
+        return future
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+
+def make_catalog(num_books, num_members, rng):
+    books = [(f"L{i:08d}", f"{rng.choice(SEARCH_WORDS).title()} Volume {i}",
+              f"Author {i % 500}", rng.choice(operations.genres), 3)
+             for i in range(num_books)]
+    members = [(f"LM{i:07d}", f"Member {i}", f"m{i}@example.com")
+               for i in range(num_members)]
+    return books, members
+
+async def worker(client, books, members, deadline, depth, mix, latencies, rng):
+    """Keep `depth` requests in flight on one connection until the deadline"""
+    in_flight = set()
+    while time.perf_counter() < deadline:
+        while len(in_flight) < depth:
+            roll = rng.random()
+            member_id = rng.choice(members)[0]
+            isbn = rng.choice(books)[0]
+            if roll < mix["borrow"]:
+                future = client.call("borrow_book", member_id, isbn)
+            elif roll < mix["borrow"] + mix["return"]:
+                future = client.call("return_book", member_id, isbn)
+            else:
+                future = client.call("search_books_page", rng.choice(SEARCH_WORDS), 10)
+            future.started = time.perf_counter()
+            in_flight.add(future)
+        await client.writer.drain()
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        now = time.perf_counter()
+        for future in done:
+            latencies.append(now - future.started)
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+async def run(args):
+    rng = random.Random(args.seed)
+    books, members = make_catalog(args.books, args.members, rng)
+
+    setup = await Client.connect(args.host, args.port)
+    await setup.call("add_books_bulk", books)
+    await setup.call("add_members_bulk", members)
+    await setup.close()
+
+    clients = [await Client.connect(args.host, args.port) for _ in range(args.connections)]
+    mix = {"borrow": args.borrow, "return": args.return_share}
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(worker(client, books, members, deadline, args.depth, mix,
+                                  latencies, random.Random(rng.random()))
+                           for client in clients))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    report = {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "connections": args.connections,
+        "pipeline_depth": args.depth,
+    }
+    print(json.dumps(report, indent=2))
+
+async def wait_for_server(host, port, timeout=10):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed borrow/return/search load for server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true", help="start server.py for the run")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--depth", type=int, default=8, help="requests in flight per connection")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--borrow", type=float, default=0.4, help="share of borrow requests")
+    parser.add_argument("--return", dest="return_share", type=float, default=0.4,
+                        help="share of return requests (the rest are searches)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        # Next to this file, so --spawn works from any directory
+        server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+        server = subprocess.Popen([sys.executable, server_path, "--host", args.host,
+                                   "--port", str(args.port)], stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_server(args.host, args.port))
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# metrics.py - Opt-in call metrics for the public functions in operations.py
+#
+#   import metrics
+#   metrics.enable()
+#   ...
+#   metrics.snapshot()                      # dict of per-function stats
+#   metrics.write_prometheus("metrics.prom")
+#   metrics.disable()
+#
+# While disabled, operations.py runs its original functions untouched, so
+# there is no overhead. enable() swaps each module attribute for a timing
+# wrapper; code that looks functions up as operations.<name> at call time
+# (demo.py, server.py) is measured, while names imported earlier with
+# `from operations import ...` are not.
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+
+import operations
+
+SAMPLE_SIZE = 10000
+QUANTILES = (0.5, 0.9, 0.99)
+
+_originals = {}
+_stats = {}
+
+class CallStats:
+    """Counters for one function plus its most recent latencies"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+        self.outcomes = {}
+
+    def record(self, elapsed, outcome, error=False):
+        with self.lock:
+            self.calls += 1
+            self.errors += error
+            self.total_seconds += elapsed
+            self.samples.append(elapsed)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            result = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "total_seconds": self.total_seconds,
+                "outcomes": dict(self.outcomes),
+            }
+        for q in QUANTILES:
+            key = f"p{round(q * 100)}_seconds"
+            result[key] = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        return result
+
+def _outcome(result):
+    # (success, message) tuples are keyed by their message
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], str):
+        return result[1]
+    return "ok"
+
+def _instrument(function, stats):
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as error:
+            stats.record(clock() - start, type(error).__name__, error=True)
+            raise
+        stats.record(clock() - start, _outcome(result))
+        return result
+
+    return wrapper
+
+def public_functions():
+    """Names of the public functions defined in operations.py"""
+    return sorted(name for name, value in vars(operations).items()
+                  if not name.startswith("_") and inspect.isfunction(value)
+                  and value.__module__ == operations.__name__)
+
+def enable():
+    """Start recording; calling it again keeps the existing numbers"""
+    for name in public_functions():
+        if name in _originals:
+            continue
+        function = getattr(operations, name)
+        stats = _stats.setdefault(name, CallStats())
+        _originals[name] = function
+        setattr(operations, name, _instrument(function, stats))
+
+def disable():
+    """Put the original functions back"""
+    for name, function in _originals.items():
+        setattr(operations, name, function)
+    _originals.clear()
+
+def is_enabled():
+    return bool(_originals)
+
+def reset():
+    """Forget everything recorded so far"""
+    for stats in _stats.values():
+        with stats.lock:
+            stats.clear()
+
+def snapshot():
+    """Per-function calls, errors, total/percentile latency and outcome counts"""
+    return {name: stats.snapshot() for name, stats in sorted(_stats.items())}
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_text():
+    lines = [
+        "# HELP library_calls_total Calls per operations.py function.",
+        "# TYPE library_calls_total counter",
+    ]
+    stats = snapshot()
+    for name, s in stats.items():
+        lines.append(f'library_calls_total{{op="{name}"}} {s["calls"]}')
+    lines += ["# HELP library_call_errors_total Calls that raised an exception.",
+              "# TYPE library_call_errors_total counter"]
+    for name, s in stats.items():
+        lines.append(f'library_call_errors_total{{op="{name}"}} {s["errors"]}')
+    lines += ["# HELP library_call_seconds Call latency over the recent sample window.",
+              "# TYPE library_call_seconds summary"]
+    for name, s in stats.items():
+        for q in QUANTILES:
+            value = s[f"p{round(q * 100)}_seconds"]
+            lines.append(f'library_call_seconds{{op="{name}",quantile="{q}"}} {value:.9f}')
+        lines.append(f'library_call_seconds_sum{{op="{name}"}} {s["total_seconds"]:.9f}')
+        lines.append(f'library_call_seconds_count{{op="{name}"}} {s["calls"]}')
+    lines += ["# HELP library_outcomes_total Calls per returned message.",
+              "# TYPE library_outcomes_total counter"]
+    for name, s in stats.items():
+        for outcome, count in sorted(s["outcomes"].items()):
+            lines.append(f'library_outcomes_total{{op="{name}",outcome="{_label(outcome)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    """Write the metrics in Prometheus text format, replacing `path` atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
@@ -1,54 +1,1092 @@
 # operations.py - Core Library Operations
 
+import heapq
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+class MemberStore:
+    """Members keyed by member_id, iterated in the order they were added"""
+
+    def __init__(self):
+        self._by_id = {}
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, member_id):
+        return member_id in self._by_id
+
+    def get(self, member_id):
+        return self._by_id.get(member_id)
+
+    def add(self, member):
+        self._by_id[member["member_id"]] = member
+
+    def remove(self, member):
+        del self._by_id[member["member_id"]]
+
+    def clear(self):
+        self._by_id.clear()
+
+class LoanTable:
+    """Current loans indexed both ways: member -> ISBNs and ISBN -> members"""
+
+    def __init__(self):
+        self._by_member = {}
+        self._by_isbn = {}
+
+    def add(self, member_id, isbn):
+        self._by_member.setdefault(member_id, set()).add(isbn)
+        self._by_isbn.setdefault(isbn, set()).add(member_id)
+
+    def remove(self, member_id, isbn):
+        self._discard(self._by_member, member_id, isbn)
+        self._discard(self._by_isbn, isbn, member_id)
+
+    def _discard(self, table, key, value):
+        values = table.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del table[key]
+
+    def has(self, member_id, isbn):
+        return isbn in self._by_member.get(member_id, ())
+
+    def holders_of(self, isbn):
+        return list(self._by_isbn.get(isbn, ()))
+
+    def loans_of(self, member_id):
+        return list(self._by_member.get(member_id, ()))
+
+    def loan_pairs(self):
+        return [(member_id, isbn) for member_id, isbns in self._by_member.items()
+                for isbn in isbns]
+
+    def clear(self):
+        self._by_member.clear()
+        self._by_isbn.clear()
+
+class Book(MutableMapping):
+    """Book record that reads and writes like a dict.
+
+    Uses __slots__ instead of a per-book dict and stores the genre as its
+    position in `genres`, roughly halving the memory used per book.
+    """
+
+    __slots__ = ("title", "author", "genre_code", "total_copies", "available_copies")
+    FIELDS = ("title", "author", "genre", "total_copies", "available_copies")
+
+    def __init__(self, title, author, genre, total_copies, available_copies):
+        self.title = title
+        self.author = author
+        self.genre_code = _genre_codes[genre]
+        self.total_copies = total_copies
+        self.available_copies = available_copies
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record["title"], record["author"], record["genre"],
+                   record["total_copies"], record["available_copies"])
+
+    @property
+    def genre(self):
+        return genres[self.genre_code]
+
+    @genre.setter
+    def genre(self, value):
+        self.genre_code = _genre_codes[value]
+
+    def __getitem__(self, key):
+        if key not in _book_fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _book_fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("Book fields cannot be removed")
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
 books = {}
-members = []
+members = MemberStore()
+loans = LoanTable()
 genres = ("Fiction", "Non-Fiction", "Sci-Fi", "History", "Biography")
+_genre_codes = {genre: code for code, genre in enumerate(genres)}
+_book_fields = frozenset(Book.FIELDS)
+
+# Search index: every 1- to 3-character slice of a lowercased title/author
+# maps to the ISBNs containing it, so a keyword only has to be checked
+# against books that share all of its n-grams.
+GRAM_SIZE = 3
+_gram_index = {}
+_book_order = {}
+_order_counter = itertools.count()
+
+# Locking: members and books are locked by ID, so operations on different
+# entities run in parallel. The locks come from two fixed pools, picked by
+# hashing the ID, so IDs that never existed (or were deleted) don't leave
+# locks behind; two IDs may share a lock. A call that needs both always
+# takes the member lock first, then the book lock, and a call that needs
+# several of one kind takes them in pool order, so two calls can never
+# wait on each other. The shared search index has a single lock of its own.
+# Mutations also hold `mutation_gate` (shared), which lets storage.py stop
+# them all while it takes a snapshot.
+LOCK_STRIPES = 1024
+_member_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_book_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_index_lock = threading.Lock()
+
+def _lock_slot(key):
+    return hash(key) % LOCK_STRIPES
+
+class MutationGate:
+    """Shared by any number of mutations at once, or held by one snapshot.
+
+    Every function that changes the library runs inside the gate (taken
+    before the entity locks, and not re-entered). quiesce() closes it to
+    new mutations, waits for the running ones to finish and keeps it
+    closed until its block ends, so storage.py never snapshots a borrow
+    that has moved a copy but not yet recorded the loan.
+    """
+
+    def __init__(self):
+        # The plain lock is what every mutation takes; the condition on it
+        # is only waited on while a snapshot holds the gate closed
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._active = 0
+        self._closed = False
+
+    def acquire(self):
+        with self._lock:
+            while self._closed:
+                self._changed.wait()
+            self._active += 1
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            if self._closed and not self._active:
+                self._changed.notify_all()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @contextmanager
+    def quiesce(self):
+        """Block with no mutation running; must not be used inside one"""
+        with self._lock:
+            while self._closed:
+                self._changed.wait()
+            self._closed = True
+            while self._active:
+                self._changed.wait()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._closed = False
+                self._changed.notify_all()
+
+mutation_gate = MutationGate()
+
+def _member_lock(member_id):
+    return _member_locks[_lock_slot(member_id)]
+
+def _book_lock(isbn):
+    return _book_locks[_lock_slot(isbn)]
+
+class SearchCache:
+    """LRU cache of search results, bounded by entry count and bytes.
+
+    Entries hold the matching ISBNs, not copies of the records, so results
+    are always built from the live books: borrowing and returning never
+    make an entry stale. Adding, retitling or deleting a book drops only
+    the entries whose keyword occurs in that book's title or author.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a result computed before a
+        # concurrent change is never stored after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, isbns, generation):
+        size = sys.getsizeof(isbns) + sys.getsizeof(key[0])
+        with self._lock:
+            if generation != self.generation or size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (isbns, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def invalidate(self, *texts):
+        """Drop the entries whose keyword occurs in any of `texts`"""
+        with self._lock:
+            self.generation += 1
+            if not self._entries:
+                return
+            texts = [text.lower() for text in texts]
+            stale = [key for key in self._entries
+                     if any(key[0] in text for text in texts)]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+search_cache = SearchCache()
+
+# Optional write-ahead log (see storage.py); every successful mutation is
+# handed to journal.append() so it can be replayed after a restart.
+journal = None
+
+def _log(op, *args, **kwargs):
+    if journal is not None:
+        journal.append(op, args, kwargs)
+    if change_log.enabled:
+        change_log.record(op, args, kwargs)
+
+# Change events: every successful mutation is also turned into one or more
+# typed events with consecutive sequence numbers, kept in a fixed-size ring
+# buffer (and optionally appended to a JSON-lines file), so other parts of
+# the system can ask for "everything after event N" instead of diffing
+# get_all_books()/get_all_members().
+ChangeEvent = namedtuple("ChangeEvent", "seq type key data time")
+EVENT_TYPES = ("book_added", "book_updated", "book_deleted", "member_added",
+               "member_updated", "member_deleted", "book_borrowed", "book_returned",
+               "hold_placed", "hold_cancelled")
+
+def _event_fields(op, args, kwargs):
+    """(type, key, data) of the event for one journaled operation"""
+    if op == "add_book":
+        isbn, title, author, genre, total_copies = args
+        return "book_added", isbn, {"title": title, "author": author, "genre": genre,
+                                    "total_copies": total_copies}
+    if op == "add_member":
+        member_id, name, email = args
+        return "member_added", member_id, {"name": name, "email": email}
+    if op == "update_book":
+        return "book_updated", args[0], dict(kwargs)
+    if op == "update_member":
+        return "member_updated", args[0], dict(kwargs)
+    if op == "delete_book":
+        return "book_deleted", args[0], {}
+    if op == "delete_member":
+        return "member_deleted", args[0], {}
+    if op == "borrow_book":
+        return "book_borrowed", args[1], {"member_id": args[0], "due": kwargs.get("due")}
+    if op == "return_book":
+        return "book_returned", args[1], {"member_id": args[0]}
+    if op == "place_hold":
+        return "hold_placed", args[1], {"member_id": args[0]}
+    if op == "cancel_hold":
+        return "hold_cancelled", args[1], {"member_id": args[0]}
+    raise ValueError(f"No change event for {op}")
+
+class ChangeLog:
+    """Ring buffer of the last `capacity` change events.
+
+    Sequence numbers start at 1 and never repeat within a process (or
+    across restarts when a file sink is open). A reader remembers the
+    last sequence number it handled and asks for what came after it; if
+    the buffer has wrapped past that point, the first event it gets back
+    has a sequence number more than one higher, and the reader knows it
+    missed some.
+
+    Mutators only store the raw operation; it is turned into a ChangeEvent
+    the first time someone reads it.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.enabled = True
+        self._ring = [None] * capacity
+        self._next_seq = 1
+        self._sink = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(threading.Lock())
+        self._waiting = 0
+
+    @property
+    def last_seq(self):
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self):
+        """Oldest sequence number still in the buffer"""
+        return max(1, self._next_seq - self.capacity)
+
+    def record(self, op, args, kwargs):
+        if op == "apply_transaction":
+            self._record_steps(args[0])
+            return
+        now = clock()
+        with self._lock:
+            seq = self._next_seq
+            self._ring[seq % self.capacity] = (seq, op, args, kwargs, now)
+            self._next_seq = seq + 1
+            if self._sink is not None:
+                self._write(seq)
+        if self._waiting:
+            self._wake()
+
+    def _record_steps(self, steps):
+        # One event per transaction step, numbered consecutively
+        now = clock()
+        with self._lock:
+            for action, member_id, isbn, due in steps:
+                seq = self._next_seq
+                if action == "borrow":
+                    entry = (seq, "borrow_book", (member_id, isbn), {"due": due}, now)
+                else:
+                    entry = (seq, "return_book", (member_id, isbn), {}, now)
+                self._ring[seq % self.capacity] = entry
+                self._next_seq = seq + 1
+                if self._sink is not None:
+                    self._write(seq)
+        if self._waiting:
+            self._wake()
+
+    def _write(self, seq):
+        event = self._event(seq)
+        self._sink.write(json.dumps(event._asdict(), separators=(",", ":")) + "\n")
+
+    def _wake(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _event(self, seq):
+        # Caller holds self._lock
+        entry = self._ring[seq % self.capacity]
+        if not isinstance(entry, ChangeEvent):
+            seq, op, args, kwargs, now = entry
+            entry = ChangeEvent(seq, *_event_fields(op, args, kwargs), now)
+            self._ring[seq % self.capacity] = entry
+        return entry
+
+    def read(self, after=0, limit=None):
+        """Events with sequence numbers above `after`, oldest first"""
+        with self._lock:
+            start = max(after + 1, self.first_seq)
+            end = self._next_seq if limit is None else min(self._next_seq, start + limit)
+            return [self._event(seq) for seq in range(start, end)]
+
+    def subscribe(self, after=0, timeout=None):
+        """Yield events after `after` as they happen. Stops once `timeout`
+        seconds pass without a new event (never, if timeout is None)."""
+        while True:
+            if self.last_seq <= after:
+                with self._changed:
+                    self._waiting += 1
+                    try:
+                        arrived = self._changed.wait_for(lambda: self.last_seq > after, timeout)
+                    finally:
+                        self._waiting -= 1
+                if not arrived:
+                    return
+            for event in self.read(after):
+                after = event.seq
+                yield event
+
+    def open_sink(self, path):
+        """Also append every event to `path` as JSON lines, continuing the
+        sequence numbers found there if no events were recorded yet"""
+        last = 0
+        for event in read_event_file(path):
+            last = event.seq
+        with self._lock:
+            if self._next_seq == 1 and last:
+                self._next_seq = last + 1
+            self._sink = open(path, "a", encoding="utf-8", buffering=1)
+
+    def close_sink(self):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+    def clear(self):
+        with self._lock:
+            self._ring = [None] * self.capacity
+            self._next_seq = 1
+
+def read_event_file(path, after=0):
+    """Events after `after` from a file written by ChangeLog.open_sink()"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = ChangeEvent(**json.loads(line))
+            except (ValueError, TypeError):
+                # A torn final line from a crash mid-write
+                break
+            if event.seq > after:
+                yield event
+
+change_log = ChangeLog()
+
+def read_changes(after=0, limit=1000):
+    """Change events after sequence number `after`, as dicts"""
+    return [event._asdict() for event in change_log.read(after, limit)]
+
+def _grams(text):
+    text = text.lower()
+    grams = set()
+    for n in range(1, GRAM_SIZE + 1):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+def _index_book(isbn):
+    book = books[isbn]
+    grams = _grams(book["title"]) | _grams(book["author"])
+    with _index_lock:
+        if isbn not in _book_order:
+            _book_order[isbn] = next(_order_counter)
+        for gram in grams:
+            _gram_index.setdefault(gram, set()).add(isbn)
+    _index_words(isbn, book)
+    search_cache.invalidate(book["title"], book["author"])
+
+def _unindex_book(isbn, forget=False):
+    book = books[isbn]
+    grams = _grams(book["title"]) | _grams(book["author"])
+    with _index_lock:
+        for gram in grams:
+            postings = _gram_index.get(gram)
+            if postings is not None:
+                postings.discard(isbn)
+                if not postings:
+                    del _gram_index[gram]
+        if forget:
+            _book_order.pop(isbn, None)
+    _unindex_words(isbn, book)
+    search_cache.invalidate(book["title"], book["author"])
+
+# Fuzzy search: every distinct word of the titles and authors is listed in
+# a SymSpell-style deletion dictionary under each variant of its first
+# FUZZY_PREFIX letters with up to FUZZY_MAX_DISTANCE letters deleted. Two
+# words within that edit distance always share a variant, so a misspelled
+# query word only has to be compared with the few words filed under its
+# own variants, however large the catalog.
+FUZZY_MAX_DISTANCE = 2
+FUZZY_PREFIX = 7
+_word_books = {}
+_word_variants = {}
+_fuzzy_lock = threading.Lock()
+_word_pattern = re.compile(r"\w+")
+
+def _words(text):
+    return _word_pattern.findall(text.lower())
+
+def _variants(word, distance=FUZZY_MAX_DISTANCE):
+    """{variant: letters deleted} for the word's prefix"""
+    frontier = {word[:FUZZY_PREFIX]}
+    found = dict.fromkeys(frontier, 0)
+    for deleted in range(1, distance + 1):
+        frontier = {variant[:i] + variant[i + 1:]
+                    for variant in frontier for i in range(len(variant))}
+        for variant in frontier:
+            found.setdefault(variant, deleted)
+    return found
+
+def _index_words(isbn, book):
+    words = set(_words(book["title"])) | set(_words(book["author"]))
+    with _fuzzy_lock:
+        for word in words:
+            holders = _word_books.get(word)
+            if holders is None:
+                holders = _word_books[word] = set()
+                for variant, deleted in _variants(word).items():
+                    _word_variants.setdefault(variant, {})[word] = deleted
+            holders.add(isbn)
+
+def _unindex_words(isbn, book):
+    words = set(_words(book["title"])) | set(_words(book["author"]))
+    with _fuzzy_lock:
+        for word in words:
+            holders = _word_books.get(word)
+            if holders is None:
+                continue
+            holders.discard(isbn)
+            if not holders:
+                # Last book with this word: drop it from the dictionary
+                del _word_books[word]
+                for variant in _variants(word):
+                    filed = _word_variants.get(variant)
+                    if filed is not None:
+                        filed.pop(word, None)
+                        if not filed:
+                            del _word_variants[variant]
+
+def _edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps count as one edit),
+    or limit + 1 as soon as it is known to exceed `limit`.
+
+    Only the cells within `limit` of the diagonal can stay under the limit,
+    so each row computes just that band.
+    """
+    if a == b:
+        return 0
+    length_a, length_b = len(a), len(b)
+    over = limit + 1
+    if abs(length_a - length_b) > limit:
+        return over
+    before = None
+    previous = [j if j <= limit else over for j in range(length_b + 1)]
+    for i in range(1, length_a + 1):
+        current = [over] * (length_b + 1)
+        if i <= limit:
+            current[0] = i
+        row_best = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - limit), min(length_b, i + limit) + 1):
+            char_b = b[j - 1]
+            if char_a == char_b:
+                value = previous[j - 1]
+            else:
+                value = min(previous[j - 1], previous[j], current[j - 1]) + 1
+                if (i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b
+                        and before[j - 2] + 1 < value):
+                    value = before[j - 2] + 1
+                if value > over:
+                    value = over
+            current[j] = value
+            if value < row_best:
+                row_best = value
+        if row_best > limit:
+            return over
+        before, previous = previous, current
+    return previous[length_b]
+
+def _allowed_distance(word, max_distance):
+    # Short words tolerate fewer typos, or everything would match them
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 4:
+        return min(1, max_distance)
+    return min(2, max_distance, FUZZY_MAX_DISTANCE)
+
+def _similar_words(word, max_distance):
+    """{indexed word: edit distance} for words within the allowed distance"""
+    allowed = _allowed_distance(word, max_distance)
+    matches = {}
+    rejected = set()
+    for variant in _variants(word, allowed):
+        for candidate, deleted in _word_variants.get(variant, {}).items():
+            # The dictionary goes FUZZY_MAX_DISTANCE deletions deep; words
+            # filed under deeper deletions than allowed can't be close enough
+            if deleted > allowed or candidate in matches or candidate in rejected:
+                continue
+            distance = _edit_distance(word, candidate, allowed)
+            if distance <= allowed:
+                matches[candidate] = distance
+            else:
+                rejected.add(candidate)
+    return matches
+
+def fuzzy_search_books(query, limit=20, max_distance=FUZZY_MAX_DISTANCE):
+    """Books whose titles/authors contain every word of `query`, allowing
+    typos: up to one edit in words of 3-4 letters and two in longer ones.
+
+    Results are search_books-style dicts, closest matches first (fewest
+    edits in total, then catalog order).
+    """
+    query_words = list(dict.fromkeys(_words(query)))
+    if not query_words:
+        return []
+    with _fuzzy_lock:
+        matches = [_similar_words(word, max_distance) for word in query_words]
+        if not all(matches):
+            return []
+        # Start from the query word with the fewest books, then check
+        # only those books against the other words
+        sizes = [sum(len(_word_books[word]) for word in found) for found in matches]
+        order = sorted(range(len(matches)), key=sizes.__getitem__)
+        scores = {}
+        for word, distance in matches[order[0]].items():
+            for isbn in _word_books[word]:
+                if distance < scores.get(isbn, FUZZY_MAX_DISTANCE + 1):
+                    scores[isbn] = distance
+        for index in order[1:]:
+            found = matches[index]
+            for isbn in list(scores):
+                best = min((distance for word, distance in found.items()
+                            if isbn in _word_books[word]), default=None)
+                if best is None:
+                    del scores[isbn]
+                else:
+                    scores[isbn] += best
+    with _index_lock:
+        ranked = sorted(scores, key=lambda isbn: (scores[isbn], _book_order.get(isbn, 0)))
+    results = []
+    for isbn in ranked:
+        result = _book_result(isbn)
+        if result is not None:
+            results.append(result)
+            if limit is not None and len(results) >= limit:
+                break
+    return results
+
+# Facets: ISBN sets per genre, per genre with copies available, and per
+# lowercased author, kept current by the mutators so filters and counts
+# never need a catalog scan.
+_genre_books = [set() for _ in genres]
+_genre_available = [set() for _ in genres]
+_available_books = set()
+_author_books = {}
+_facet_lock = threading.Lock()
+
+def _facet_book(isbn):
+    book = books[isbn]
+    with _facet_lock:
+        _genre_books[book.genre_code].add(isbn)
+        if book.available_copies > 0:
+            _genre_available[book.genre_code].add(isbn)
+            _available_books.add(isbn)
+        _author_books.setdefault(book.author.lower(), set()).add(isbn)
+    _count_copies(book, 1)
+
+def _unfacet_book(isbn):
+    book = books[isbn]
+    _count_copies(book, -1)
+    with _facet_lock:
+        _genre_books[book.genre_code].discard(isbn)
+        _genre_available[book.genre_code].discard(isbn)
+        _available_books.discard(isbn)
+        author = book.author.lower()
+        author_books = _author_books.get(author)
+        if author_books is not None:
+            author_books.discard(isbn)
+            if not author_books:
+                del _author_books[author]
+
+def _refresh_availability(isbn, book):
+    with _facet_lock:
+        if book.available_copies > 0:
+            _genre_available[book.genre_code].add(isbn)
+            _available_books.add(isbn)
+        else:
+            _genre_available[book.genre_code].discard(isbn)
+            _available_books.discard(isbn)
+
+# Circulation statistics, updated by every change instead of recomputed
+# for each report: copies and copies on loan per genre, and lifetime
+# borrow counts per book and per member with a leaderboard for each.
+LEADERBOARD_SIZE = 20
+
+class Leaderboard:
+    """The `size` keys with the highest counts, for counts that only go up.
+
+    Keys off the board wait in a max-heap, so removing a key that is on
+    the board refills its place in O(log n). A key can only enter the board
+    by beating its lowest count: an increment costs O(log n) for the heap
+    push, plus O(size) when it changes the board. The heap keeps stale
+    entries until it is twice the number of keys, then is rebuilt in O(n),
+    so all of these bounds are amortized.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        self.counts = {}
+        self._top = {}
+        self._floor = 0
+        # (-count, key) for keys off the board; stale once the key's
+        # count changes, it joins the board or it is removed
+        self._waiting = []
+
+    def increment(self, key):
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        top = self._top
+        if key in top:
+            top[key] = count
+            if count - 1 == self._floor and len(top) == self.size:
+                self._floor = min(top.values())
+        elif len(top) < self.size:
+            top[key] = count
+            if len(top) == self.size:
+                self._floor = min(top.values())
+        elif count > self._floor:
+            lowest = min(top, key=top.get)
+            self._wait(lowest, top.pop(lowest))
+            top[key] = count
+            self._floor = min(top.values())
+        else:
+            self._wait(key, count)
+
+    def _wait(self, key, count):
+        heapq.heappush(self._waiting, (-count, key))
+        if len(self._waiting) > 2 * len(self.counts) + 64:
+            self._waiting = [(-count, key) for key, count in self.counts.items()
+                             if key not in self._top]
+            heapq.heapify(self._waiting)
+
+    def remove(self, key):
+        """Forget `key`; if it was on the board, the best waiting key takes its place"""
+        self.counts.pop(key, None)
+        if self._top.pop(key, None) is None:
+            return
+        counts, top, waiting = self.counts, self._top, self._waiting
+        while waiting:
+            count, waiting_key = heapq.heappop(waiting)
+            if counts.get(waiting_key) == -count and waiting_key not in top:
+                top[waiting_key] = -count
+                break
+        self._floor = min(top.values()) if len(top) == self.size else 0
+
+    def top(self, limit=10):
+        """(key, count) pairs, highest count first"""
+        ranked = sorted(self._top.items(), key=lambda item: (-item[1], str(item[0])))
+        return ranked[:limit]
+
+    def load(self, counts):
+        self.counts = {}
+        self._top = {}
+        self._floor = 0
+        self._waiting = []
+        for key, count in counts.items():
+            self.counts[key] = count - 1
+            self.increment(key)
+
+_genre_copies = [0] * len(genres)
+_genre_on_loan = [0] * len(genres)
+_book_borrows = Leaderboard()
+_member_borrows = Leaderboard()
+_stats_lock = threading.Lock()
+
+def _count_copies(book, sign):
+    with _stats_lock:
+        _genre_copies[book.genre_code] += sign * book.total_copies
+        _genre_on_loan[book.genre_code] += sign * (book.total_copies - book.available_copies)
+
+def _count_loan(member_id, isbn, book, sign):
+    with _stats_lock:
+        _genre_on_loan[book.genre_code] += sign
+        if sign > 0:
+            _book_borrows.increment(isbn)
+            _member_borrows.increment(member_id)
+
+def circulation_stats():
+    """Copies, copies on loan and utilization, overall and per genre"""
+    with _stats_lock:
+        copies = list(_genre_copies)
+        on_loan = list(_genre_on_loan)
+    by_genre = {genre: {"copies": copies[code], "on_loan": on_loan[code],
+                        "utilization": on_loan[code] / copies[code] if copies[code] else 0.0}
+                for code, genre in enumerate(genres)}
+    total, lent = sum(copies), sum(on_loan)
+    return {"copies": total, "on_loan": lent,
+            "utilization": lent / total if total else 0.0, "genres": by_genre}
+
+def most_borrowed(limit=10):
+    """(isbn, times borrowed) for the most borrowed books still in the catalog"""
+    with _stats_lock:
+        return _book_borrows.top(limit)
+
+def most_active_members(limit=10):
+    """(member_id, books borrowed) for the members who borrowed the most"""
+    with _stats_lock:
+        return _member_borrows.top(limit)
+
+def stats_state():
+    """Lifetime borrow counts, for storage.py snapshots"""
+    with _stats_lock:
+        return {"books": dict(_book_borrows.counts), "members": dict(_member_borrows.counts)}
+
+def restore_stats(state):
+    with _stats_lock:
+        _book_borrows.load(state.get("books", {}))
+        _member_borrows.load(state.get("members", {}))
+
+def rebuild_indexes():
+    """Rebuild the lookup indexes after `books` or `members` was changed directly.
+
+    Borrow counts are kept for the books and members that are still there.
+    """
+    with _index_lock:
+        _gram_index.clear()
+        _book_order.clear()
+    with _fuzzy_lock:
+        _word_books.clear()
+        _word_variants.clear()
+    search_cache.clear()
+    with _facet_lock:
+        for genre_set in _genre_books + _genre_available:
+            genre_set.clear()
+        _available_books.clear()
+        _author_books.clear()
+    with _stats_lock:
+        _genre_copies[:] = [0] * len(genres)
+        _genre_on_loan[:] = [0] * len(genres)
+        _book_borrows.load({isbn: count for isbn, count in _book_borrows.counts.items()
+                            if isbn in books})
+        _member_borrows.load({member_id: count
+                              for member_id, count in _member_borrows.counts.items()
+                              if members.get(member_id) is not None})
+    for isbn in books:
+        _index_book(isbn)
+        _facet_book(isbn)
+    loans.clear()
+    for member in members:
+        for isbn in member["borrowed_books"]:
+            loans.add(member["member_id"], isbn)
+    _rebuild_schedule()
+
+def _search_candidates(keyword):
+    if not keyword:
+        return list(books)
+    with _index_lock:
+        if len(keyword) <= GRAM_SIZE:
+            return list(_gram_index.get(keyword, ()))
+        postings = []
+        for i in range(len(keyword) - GRAM_SIZE + 1):
+            gram_postings = _gram_index.get(keyword[i:i + GRAM_SIZE])
+            if not gram_postings:
+                return []
+            postings.append(gram_postings)
+        postings.sort(key=len)
+        return list(postings[0].intersection(*postings[1:]))
 
 def add_book(isbn, title, author, genre, total_copies):
-    if isbn in books:
-        return False, "Book already exists."
-    if genre not in genres:
-        return False, "Invalid genre."
-    books[isbn] = {
-        "title": title, 
-        "author": author, 
-        "genre": genre, 
-        "total_copies": total_copies, 
-        "available_copies": total_copies
-    }
-    return True, "Book added successfully."
+    with mutation_gate, _book_lock(isbn):
+        if isbn in books:
+            return False, "Book already exists."
+        if genre not in genres:
+            return False, "Invalid genre."
+        _insert_book(isbn, title, author, genre, total_copies)
+        return True, "Book added successfully."
+
+def _insert_book(isbn, title, author, genre, total_copies):
+    """Store, index, count and log a new book; the caller holds its lock"""
+    books[isbn] = Book(title, author, genre, total_copies, total_copies)
+    try:
+        _index_book(isbn)
+    except Exception:
+        # e.g. a title that is not a string: don't leave the book half added
+        _book_order.pop(isbn, None)
+        del books[isbn]
+        raise
+    _facet_book(isbn)
+    _log("add_book", isbn, title, author, genre, total_copies)
 
 def add_member(member_id, name, email):
-    for m in members:
-        if m["member_id"] == member_id:
+    with mutation_gate, _member_lock(member_id):
+        if member_id in members:
             return False, "Member already exists."
-    members.append({
-        "member_id": member_id, 
-        "name": name, 
-        "email": email, 
-        "borrowed_books": []
-    })
-    return True, "Member added successfully."
+        members.add({
+            "member_id": member_id, 
+            "name": name, 
+            "email": email, 
+            "borrowed_books": []
+        })
+        _log("add_member", member_id, name, email)
+        return True, "Member added successfully."
+
+def _match_rank(keyword, book):
+    """0/1 = title prefix/infix hit, 2/3 = author prefix/infix hit, None = miss"""
+    for rank, field in ((0, book["title"].lower()), (2, book["author"].lower())):
+        position = field.find(keyword)
+        if position < 0:
+            continue
+        # A later occurrence at the start of a word still counts as a prefix hit
+        while position > 0 and field[position - 1] != " ":
+            position = field.find(keyword, position + 1)
+            if position < 0:
+                return rank + 1
+        return rank
+    return None
+
+def _matching_isbns(keyword, ranked=False):
+    keyword = keyword.lower()
+    if not keyword:
+        return list(books)
+    key = (keyword, ranked)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    generation = search_cache.generation
+    keys = {}
+    for isbn in _search_candidates(keyword):
+        book = books.get(isbn)
+        # Candidates share the keyword's n-grams; confirm the real substring
+        if book is not None:
+            rank = _match_rank(keyword, book)
+            # A book being deleted leaves _book_order before books; drop it
+            order = _book_order.get(isbn)
+            if rank is not None and order is not None:
+                keys[isbn] = (rank, order) if ranked else order
+    # Unranked results keep catalog order, as a full scan would return them
+    isbns = sorted(keys, key=keys.__getitem__)
+    search_cache.put(key, isbns, generation)
+    return isbns
+
+def _book_result(isbn, book=None):
+    """The search result dict for a book, or None if it was just deleted"""
+    if book is None:
+        book = books.get(isbn)
+        if book is None:
+            return None
+    return {
+        "isbn": isbn,
+        "title": book["title"],
+        "author": book["author"], 
+        "genre": book["genre"],
+        "total_copies": book["total_copies"],
+        "available_copies": book["available_copies"]
+    }
+
+def iter_search_books(keyword, ranked=False):
+    """Yield search results one at a time instead of building the whole list.
+
+    With ranked=True, title hits come before author hits and word-prefix
+    hits before hits in the middle of a word.
+
+    Only the result records are built lazily. The matching ISBNs are found
+    and sorted up front, so the first call for a keyword costs
+    O(m log m) for m matches even when the caller takes one page; a
+    one-letter keyword on a large catalog matches most of it. The sorted
+    list is kept in search_cache, so later calls for the same keyword
+    skip that until a change to a matching book drops the entry.
+    """
+    for isbn in _matching_isbns(keyword, ranked):
+        # Skip books deleted while the caller was still iterating
+        result = _book_result(isbn)
+        if result is not None:
+            yield result
+
+def search_books_page(keyword, limit=10, cursor=None, ranked=False):
+    """Return (results, next_cursor) for one page of search results.
+
+    Pass next_cursor back in to fetch the following page; it is None once
+    the last page has been returned. Records are built for the page only,
+    but the first page of a keyword sorts every match (see
+    iter_search_books); later pages slice the cached list.
+    """
+    offset = page_offset(cursor)
+    isbns = _matching_isbns(keyword, ranked)[offset:offset + limit + 1]
+    # Skip books deleted since the list was cached
+    page = [result for result in map(_book_result, isbns[:limit]) if result is not None]
+    if len(isbns) > limit:
+        return page, str(offset + limit)
+    return page, None
+
+def page_offset(cursor):
+    """The row offset a next_cursor stands for; ValueError if it is not one"""
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except (TypeError, ValueError):
+        offset = -1
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return offset
 
 def search_books(keyword):
-    results = []
-    for isbn, book in books.items():
-        if (keyword.lower() in book["title"].lower() or 
-            keyword.lower() in book["author"].lower()):
-            results.append({
-                "isbn": isbn,
-                "title": book["title"],
-                "author": book["author"], 
-                "genre": book["genre"],
-                "total_copies": book["total_copies"],
-                "available_copies": book["available_copies"]
-            })
-    return results
+    return list(iter_search_books(keyword))
 
 def update_book(isbn, **kwargs):
-    if isbn not in books:
-        return False, "Book not found."
+    result = _update_book(isbn, kwargs)
+    if "total_copies" in kwargs and fulfil_holds and isbn in _hold_queues:
+        # New copies go to the members waiting for them
+        _fulfil_holds(isbn)
+    return result
+
+def _update_book(isbn, kwargs):
+    with mutation_gate, _book_lock(isbn):
+        if isbn not in books:
+            return False, "Book not found."
     
+        reindex = "title" in kwargs or "author" in kwargs
+        if reindex:
+            _unindex_book(isbn)
+        _unfacet_book(isbn)
+        applied = {}
+        try:
+            return apply_book_updates(books[isbn], kwargs, applied)
+        finally:
+            if reindex:
+                _index_book(isbn)
+            _facet_book(isbn)
+            # Fields before a rejected one stay applied; log just those, so
+            # the rejected value never reaches the log and fails on replay
+            if applied:
+                _log("update_book", isbn, **applied)
+
+def apply_book_updates(book, kwargs, applied=None):
+    """Apply update_book's field rules to a book record (shared by repositories).
+
+    Fields that were set are also copied into `applied`, if given.
+    """
     valid_fields = ['title', 'author', 'genre', 'total_copies']
     for field, value in kwargs.items():
         if field in valid_fields:
@@ -57,127 +1095,728 @@ def update_book(isbn, **kwargs):
             
             if field == 'total_copies':
                 # If increasing total copies, also increase available copies
-                current_total = books[isbn]['total_copies']
-                current_available = books[isbn]['available_copies']
+                current_total = book['total_copies']
+                current_available = book['available_copies']
                 if value > current_total:
                     # Increase available copies by the difference
-                    books[isbn]['available_copies'] += (value - current_total)
+                    book['available_copies'] += (value - current_total)
                 elif value < current_total:
                     # Can't reduce total copies below currently borrowed count
                     borrowed_count = current_total - current_available
                     if value < borrowed_count:
                         return False, f"Cannot reduce total copies below currently borrowed count ({borrowed_count})"
-                    books[isbn]['available_copies'] = value - borrowed_count
+                    book['available_copies'] = value - borrowed_count
             
-            books[isbn][field] = value
+            book[field] = value
+            if applied is not None:
+                applied[field] = value
     
     return True, "Book updated successfully."
 
 def update_member(member_id, **kwargs):
-    member = None
-    for m in members:
-        if m["member_id"] == member_id:
-            member = m
-            break
+    with mutation_gate, _member_lock(member_id):
+        member = members.get(member_id)
     
-    if not member:
-        return False, "Member not found."
+        if not member:
+            return False, "Member not found."
     
-    valid_fields = ['name', 'email']
-    for field, value in kwargs.items():
-        if field in valid_fields:
-            member[field] = value
+        valid_fields = ['name', 'email']
+        applied = {}
+        for field, value in kwargs.items():
+            if field in valid_fields:
+                member[field] = value
+                applied[field] = value
     
-    return True, "Member updated successfully."
+        # Unknown fields change nothing, so they are neither logged nor announced
+        if applied:
+            _log("update_member", member_id, **applied)
+        return True, "Member updated successfully."
 
 def delete_book(isbn):
-    if isbn not in books:
-        return False, "Book not found."
+    with mutation_gate, _book_lock(isbn):
+        if isbn not in books:
+            return False, "Book not found."
     
-    # Check if any copies are borrowed
-    if books[isbn]["available_copies"] < books[isbn]["total_copies"]:
-        return False, "Cannot delete book - copies are currently borrowed"
+        # Check if any copies are borrowed
+        if books[isbn]["available_copies"] < books[isbn]["total_copies"]:
+            return False, "Cannot delete book - copies are currently borrowed"
     
-    del books[isbn]
-    return True, "Book deleted successfully."
+        _unindex_book(isbn, forget=True)
+        _unfacet_book(isbn)
+        with _stats_lock:
+            _book_borrows.remove(isbn)
+        del books[isbn]
+        _hold_queues.pop(isbn, None)
+        _log("delete_book", isbn)
+        return True, "Book deleted successfully."
 
 def delete_member(member_id):
-    member = None
-    for m in members:
-        if m["member_id"] == member_id:
-            member = m
-            break
-    
-    if not member:
-        return False, "Member not found."
-    
-    # Check if member has borrowed books
-    if member["borrowed_books"]:
-        return False, "Cannot delete member - they have borrowed books"
-    
-    members.remove(member)
-    return True, "Member deleted successfully."
-
-def borrow_book(member_id, isbn):
-    # Find member
-    member = None
-    for m in members:
-        if m["member_id"] == member_id:
-            member = m
-            break
-    
-    if not member:
-        return False, "Member not found."
-    
-    # Check book exists
-    if isbn not in books:
-        return False, "Book not found."
-    
-    # Check borrow limit
-    if len(member["borrowed_books"]) >= 3:
-        return False, "Borrow limit reached."
-    
-    # Check availability
-    if books[isbn]["available_copies"] <= 0:
-        return False, "No copies available."
-    
-    # Check if already borrowed
-    if isbn in member["borrowed_books"]:
-        return False, "Member already has this book borrowed."
-    
-    # Process borrowing
-    books[isbn]["available_copies"] -= 1
+    with mutation_gate, _member_lock(member_id):
+        member = members.get(member_id)
+    
+        if not member:
+            return False, "Member not found."
+    
+        # Check if member has borrowed books
+        if member["borrowed_books"]:
+            return False, "Cannot delete member - they have borrowed books"
+    
+        members.remove(member)
+        with _stats_lock:
+            _member_borrows.remove(member_id)
+        _log("delete_member", member_id)
+        return True, "Member deleted successfully."
+
+# Status codes used by the circulation helpers and the bulk functions
+STATUS_OK = 0
+STATUS_BOOK_EXISTS = 1
+STATUS_MEMBER_EXISTS = 2
+STATUS_INVALID_GENRE = 3
+STATUS_MEMBER_NOT_FOUND = 4
+STATUS_BOOK_NOT_FOUND = 5
+STATUS_LIMIT_REACHED = 6
+STATUS_NO_COPIES = 7
+STATUS_ALREADY_BORROWED = 8
+STATUS_NOT_BORROWED = 9
+STATUS_INVALID_ROW = 10
+STATUS_MESSAGES = (
+    "OK.",
+    "Book already exists.",
+    "Member already exists.",
+    "Invalid genre.",
+    "Member not found.",
+    "Book not found.",
+    "Borrow limit reached.",
+    "No copies available.",
+    "Member already has this book borrowed.",
+    "Book not borrowed by this member.",
+    "Invalid row.",
+)
+BORROW_LIMIT = 3
+
+def _borrow(member_id, isbn, due=None):
+    with mutation_gate, _member_lock(member_id), _book_lock(isbn):
+        # Find member
+        member = members.get(member_id)
+    
+        if not member:
+            return STATUS_MEMBER_NOT_FOUND
+    
+        # Check book exists
+        book = books.get(isbn)
+        if book is None:
+            return STATUS_BOOK_NOT_FOUND
+    
+        # Check borrow limit
+        if len(member["borrowed_books"]) >= BORROW_LIMIT:
+            return STATUS_LIMIT_REACHED
+    
+        # Check availability
+        if book.available_copies <= 0:
+            return STATUS_NO_COPIES
+    
+        # Check if already borrowed
+        if loans.has(member_id, isbn):
+            return STATUS_ALREADY_BORROWED
+    
+        # Process borrowing
+        due = _lend(member_id, member, isbn, book, due)
+        _log("borrow_book", member_id, isbn, due=due)
+        return STATUS_OK
+
+def _lend(member_id, member, isbn, book, due):
+    """Record a checked loan; the caller holds both locks. Returns the due time."""
+    book.available_copies -= 1
+    if book.available_copies == 0:
+        _refresh_availability(isbn, book)
     member["borrowed_books"].append(isbn)
-    return True, "Book borrowed successfully."
+    loans.add(member_id, isbn)
+    _count_loan(member_id, isbn, book, 1)
+    queue = _hold_queues.get(isbn)
+    if queue and member_id in queue:
+        _drop_hold(isbn, queue, member_id)
+    return _schedule_loan(member_id, isbn, due)
 
-def return_book(member_id, isbn):
-    # Find member
-    member = None
-    for m in members:
-        if m["member_id"] == member_id:
-            member = m
-            break
+def _return(member_id, isbn):
+    with mutation_gate, _member_lock(member_id), _book_lock(isbn):
+        # Find member
+        member = members.get(member_id)
     
-    if not member:
-        return False, "Member not found."
+        if not member:
+            return STATUS_MEMBER_NOT_FOUND
     
-    # Check book exists
-    if isbn not in books:
-        return False, "Book not found."
+        # Check book exists
+        book = books.get(isbn)
+        if book is None:
+            return STATUS_BOOK_NOT_FOUND
     
-    # Check if book is borrowed by this member
-    if isbn not in member["borrowed_books"]:
-        return False, "Book not borrowed by this member."
+        # Check if book is borrowed by this member
+        if not loans.has(member_id, isbn):
+            return STATUS_NOT_BORROWED
     
-    # Process return
+        # Process return
+        _take_back(member_id, member, isbn, book)
+        _log("return_book", member_id, isbn)
+    # With the locks released, the next member in line can be served. Holds
+    # are only placed while no copy is free, so one placed after this copy
+    # went back is refused and the unlocked check below can't miss it.
+    if fulfil_holds and isbn in _hold_queues:
+        _fulfil_holds(isbn)
+    return STATUS_OK
+
+def _take_back(member_id, member, isbn, book):
+    """Undo a checked loan; the caller holds both locks"""
     member["borrowed_books"].remove(isbn)
-    books[isbn]["available_copies"] += 1
+    loans.remove(member_id, isbn)
+    _unschedule_loan(member_id, isbn)
+    book.available_copies += 1
+    if book.available_copies == 1:
+        _refresh_availability(isbn, book)
+    _count_loan(member_id, isbn, book, -1)
+
+def borrow_book(member_id, isbn, due=None):
+    """Lend a copy for LOAN_PERIOD seconds, or until `due` if given"""
+    status = _borrow(member_id, isbn, due)
+    if status != STATUS_OK:
+        return False, STATUS_MESSAGES[status]
+    return True, "Book borrowed successfully."
+
+def return_book(member_id, isbn):
+    status = _return(member_id, isbn)
+    if status != STATUS_OK:
+        return False, STATUS_MESSAGES[status]
     return True, "Book returned successfully."
 
+# Transactions: several borrows and returns applied all-or-nothing.
+#
+#   with operations.transaction() as tx:
+#       tx.return_book("M001", "001")
+#       tx.borrow_book("M001", "002")
+#   tx.result  -> (True, "Transaction committed (2 steps).")
+#
+# Commit locks every member and then every book involved, each in sorted
+# order (so two transactions can't deadlock, and single calls, which take
+# one member lock then one book lock, can't deadlock with them either).
+# It looks each one up once, checks all the steps in order against a
+# running tally, and only if every step passes applies them. The whole
+# transaction is one journal record, so a crash never replays half of it.
+class Transaction:
+    """Steps staged for one atomic commit"""
+
+    def __init__(self):
+        self.steps = []
+        self.statuses = None
+        self.result = None
+
+    def borrow_book(self, member_id, isbn, due=None):
+        self.steps.append(("borrow", member_id, isbn, due))
+
+    def return_book(self, member_id, isbn):
+        self.steps.append(("return", member_id, isbn, None))
+
+    def commit(self):
+        """Apply every step or none; returns (success, message).
+
+        `statuses` is left with one status code per step; when the
+        transaction fails, the steps after the first failure are checked
+        as if the failed ones had been left out.
+        """
+        self.statuses, self.result = _commit(self.steps)
+        return self.result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # An exception inside the block discards the staged steps
+        if exc_type is None and self.result is None:
+            self.commit()
+        return False
+
+def transaction():
+    return Transaction()
+
+def apply_transaction(steps):
+    """Commit ("borrow" | "return", member_id, isbn[, due]) steps atomically"""
+    staged = []
+    for step in steps:
+        step = tuple(step)
+        if len(step) == 3:
+            step += (None,)
+        staged.append(step if len(step) == 4 else None)
+    return _commit(staged)[1]
+
+def _commit(steps):
+    statuses = array("B", bytes(len(steps)))
+    if not steps:
+        return statuses, (True, "Transaction committed (0 steps).")
+    rows = [step for step in steps if step is not None]
+    member_ids = sorted({step[1] for step in rows}, key=str)
+    isbns = sorted({step[2] for step in rows}, key=str)
+    # Each pool lock once, in pool order: two IDs can share a lock
+    locks = [mutation_gate]
+    locks += [_member_locks[slot] for slot in sorted({_lock_slot(m) for m in member_ids})]
+    locks += [_book_locks[slot] for slot in sorted({_lock_slot(i) for i in isbns})]
+    for lock in locks:
+        lock.acquire()
+    try:
+        found_members = {member_id: members.get(member_id) for member_id in member_ids}
+        found_books = {isbn: books.get(isbn) for isbn in isbns}
+        counts = {member_id: len(member["borrowed_books"])
+                  for member_id, member in found_members.items() if member}
+        available = {isbn: book.available_copies
+                     for isbn, book in found_books.items() if book is not None}
+        staged_loans = {}
+        failed = None
+        for index, step in enumerate(steps):
+            status = _check_step(step, found_members, found_books, counts,
+                                 available, staged_loans)
+            statuses[index] = status
+            if status != STATUS_OK and failed is None:
+                failed = index
+        if failed is not None:
+            step = steps[failed]
+            where = f"{step[0]} {step[1]} {step[2]}" if step is not None else "invalid"
+            return statuses, (False, f"Step {failed + 1} ({where}): "
+                                     f"{STATUS_MESSAGES[statuses[failed]]} Nothing was applied.")
+
+        applied = []
+        for action, member_id, isbn, due in steps:
+            member, book = found_members[member_id], found_books[isbn]
+            if action == "borrow":
+                due = _lend(member_id, member, isbn, book, due)
+            else:
+                _take_back(member_id, member, isbn, book)
+            applied.append([action, member_id, isbn, due])
+        _log("apply_transaction", applied)
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    if fulfil_holds:
+        for isbn in {step[2] for step in steps if step[0] == "return"}:
+            if isbn in _hold_queues:
+                _fulfil_holds(isbn)
+    return statuses, (True, f"Transaction committed ({len(steps)} steps).")
+
+def _check_step(step, found_members, found_books, counts, available, staged_loans):
+    """_borrow/_return's checks against the transaction's running tally"""
+    if step is None or step[0] not in ("borrow", "return"):
+        return STATUS_INVALID_ROW
+    action, member_id, isbn, _ = step
+    if found_members[member_id] is None:
+        return STATUS_MEMBER_NOT_FOUND
+    if found_books[isbn] is None:
+        return STATUS_BOOK_NOT_FOUND
+    on_loan = staged_loans.get((member_id, isbn))
+    if on_loan is None:
+        on_loan = loans.has(member_id, isbn)
+    if action == "borrow":
+        if counts[member_id] >= BORROW_LIMIT:
+            return STATUS_LIMIT_REACHED
+        if available[isbn] <= 0:
+            return STATUS_NO_COPIES
+        if on_loan:
+            return STATUS_ALREADY_BORROWED
+        counts[member_id] += 1
+        available[isbn] -= 1
+    else:
+        if not on_loan:
+            return STATUS_NOT_BORROWED
+        counts[member_id] -= 1
+        available[isbn] += 1
+    staged_loans[(member_id, isbn)] = action == "borrow"
+    return STATUS_OK
+
+# Due dates and holds. Every loan's due time is in _due_dates; _due_heap
+# orders the loans that are not yet known to be overdue by due time, so the
+# soonest ones are found without looking at the rest. Entries for returned
+# loans are left in the heap and skipped when they reach the top. Sweeping
+# moves loans that have come due from the heap into _overdue.
+LOAN_PERIOD = 14 * 24 * 60 * 60
+SWEEP_BATCH_SIZE = 1000
+clock = time.time
+# Returns and new copies hand books to waiting members; storage.py turns
+# this off while replaying its log, which already has those borrows
+fulfil_holds = True
+
+_due_dates = {}
+_due_heap = []
+_overdue = {}
+_hold_queues = {}
+_schedule_lock = threading.Lock()
+
+def _schedule_loan(member_id, isbn, due=None):
+    if due is None:
+        due = clock() + LOAN_PERIOD
+    with _schedule_lock:
+        _due_dates[(member_id, isbn)] = due
+        heapq.heappush(_due_heap, (due, member_id, isbn))
+    return due
+
+def _unschedule_loan(member_id, isbn):
+    with _schedule_lock:
+        _due_dates.pop((member_id, isbn), None)
+        _overdue.pop((member_id, isbn), None)
+        # Drop the skipped entries once they make up most of the heap
+        if len(_due_heap) > 64 and len(_due_heap) > 2 * (len(_due_dates) - len(_overdue)):
+            _due_heap[:] = [entry for entry in _due_heap if _is_pending(entry)]
+            heapq.heapify(_due_heap)
+
+def _is_pending(entry):
+    key = (entry[1], entry[2])
+    return _due_dates.get(key) == entry[0] and key not in _overdue
+
+def _rebuild_schedule():
+    # Loans keep their due dates; ones without a date get a full loan period
+    with _schedule_lock:
+        current = set(loans.loan_pairs())
+        for key in [key for key in _due_dates if key not in current]:
+            del _due_dates[key]
+        for key in [key for key in _overdue if key not in current]:
+            del _overdue[key]
+        start = clock()
+        for key in current:
+            _due_dates.setdefault(key, start + LOAN_PERIOD)
+        _due_heap[:] = [(due, member_id, isbn) for (member_id, isbn), due in _due_dates.items()
+                        if (member_id, isbn) not in _overdue]
+        heapq.heapify(_due_heap)
+    for isbn in [isbn for isbn in _hold_queues if isbn not in books]:
+        del _hold_queues[isbn]
+
+def due_date(member_id, isbn):
+    """When the loan is due (seconds since the epoch), None if there is no loan"""
+    return _due_dates.get((member_id, isbn))
+
+def next_due(limit=10):
+    """The `limit` loans due soonest that are not overdue yet, as
+    (member_id, isbn, due) tuples; costs O(limit log n)"""
+    with _schedule_lock:
+        found = []
+        while _due_heap and len(found) < limit:
+            entry = heapq.heappop(_due_heap)
+            if _is_pending(entry):
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(_due_heap, entry)
+    return [(member_id, isbn, due) for due, member_id, isbn in found]
+
+def sweep_overdue(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Mark every loan due by `now` as overdue; returns the newly overdue
+    (member_id, isbn, due) tuples, soonest due first.
+
+    Only loans that have come due are touched. They are taken off the heap
+    `batch_size` at a time, letting other threads in between batches.
+    """
+    now = clock() if now is None else now
+    swept = []
+    while True:
+        with _schedule_lock:
+            batch = 0
+            while _due_heap and _due_heap[0][0] <= now and batch < batch_size:
+                entry = heapq.heappop(_due_heap)
+                if _is_pending(entry):
+                    _overdue[(entry[1], entry[2])] = entry[0]
+                    swept.append((entry[1], entry[2], entry[0]))
+                batch += 1
+            done = not _due_heap or _due_heap[0][0] > now
+        if done:
+            return swept
+
+def overdue_loans(limit=None):
+    """Loans found overdue by sweep_overdue() and not yet returned, oldest first"""
+    with _schedule_lock:
+        overdue = sorted((due, member_id, isbn) for (member_id, isbn), due in _overdue.items())
+    if limit is not None:
+        overdue = overdue[:limit]
+    return [(member_id, isbn, due) for due, member_id, isbn in overdue]
+
+def start_overdue_sweeper(interval=60.0, on_overdue=None):
+    """Sweep in a background thread, waking when the next loan comes due
+    (or every `interval` seconds at most); newly overdue loans are passed
+    to on_overdue. Returns an Event; set it to stop the thread."""
+    stop = threading.Event()
+
+    def run():
+        while True:
+            upcoming = next_due(1)
+            wait = interval
+            if upcoming:
+                wait = max(0.0, min(interval, upcoming[0][2] - clock()))
+            if stop.wait(wait):
+                return
+            swept = sweep_overdue()
+            if swept and on_overdue is not None:
+                on_overdue(swept)
+
+    threading.Thread(target=run, daemon=True).start()
+    return stop
+
+def _drop_hold(isbn, queue, member_id):
+    queue.remove(member_id)
+    if not queue:
+        del _hold_queues[isbn]
+
+def place_hold(member_id, isbn):
+    """Join the FIFO waitlist for a book that has no copies on the shelf"""
+    with mutation_gate, _member_lock(member_id), _book_lock(isbn):
+        if member_id not in members:
+            return False, STATUS_MESSAGES[STATUS_MEMBER_NOT_FOUND]
+        book = books.get(isbn)
+        if book is None:
+            return False, STATUS_MESSAGES[STATUS_BOOK_NOT_FOUND]
+        if loans.has(member_id, isbn):
+            return False, STATUS_MESSAGES[STATUS_ALREADY_BORROWED]
+        if book.available_copies > 0:
+            return False, "Copies are available - borrow the book instead."
+        queue = _hold_queues.setdefault(isbn, deque())
+        if member_id in queue:
+            return False, "Member already has a hold on this book."
+        queue.append(member_id)
+        _log("place_hold", member_id, isbn)
+        return True, f"Hold placed (position {len(queue)})."
+
+def cancel_hold(member_id, isbn):
+    with mutation_gate, _book_lock(isbn):
+        queue = _hold_queues.get(isbn)
+        if not queue or member_id not in queue:
+            return False, "No hold found for this member."
+        _drop_hold(isbn, queue, member_id)
+        _log("cancel_hold", member_id, isbn)
+        return True, "Hold cancelled."
+
+def holds_for(isbn):
+    """Member IDs waiting for `isbn`, first in line first"""
+    return list(_hold_queues.get(isbn, ()))
+
+def _fulfil_holds(isbn):
+    """Lend free copies of `isbn` to waiting members in queue order.
+
+    Members at their borrow limit keep their place and are skipped; holds
+    of deleted members are dropped. Called without any locks held, since
+    _borrow takes the member lock before the book lock.
+    """
+    skipped = set()
+    while True:
+        with _book_lock(isbn):
+            book = books.get(isbn)
+            queue = _hold_queues.get(isbn)
+            if book is None or book.available_copies <= 0 or not queue:
+                return
+            waiting = [member_id for member_id in queue if member_id not in skipped]
+        if not waiting:
+            return
+        member_id = waiting[0]
+        status = _borrow(member_id, isbn)
+        if status == STATUS_LIMIT_REACHED:
+            skipped.add(member_id)
+        elif status in (STATUS_MEMBER_NOT_FOUND, STATUS_ALREADY_BORROWED):
+            with mutation_gate, _book_lock(isbn):
+                queue = _hold_queues.get(isbn)
+                if queue and member_id in queue:
+                    _drop_hold(isbn, queue, member_id)
+        elif status != STATUS_OK:
+            return
+
+def schedule_state():
+    """Due dates, overdue marks and hold queues, for storage.py snapshots"""
+    with _schedule_lock:
+        due = [[member_id, isbn, when] for (member_id, isbn), when in _due_dates.items()]
+        overdue = [[member_id, isbn] for member_id, isbn in _overdue]
+    holds = {isbn: list(queue) for isbn, queue in list(_hold_queues.items())}
+    return {"due": due, "overdue": overdue, "holds": holds}
+
+def restore_schedule(state):
+    """Load what schedule_state() returned (after books/members are loaded)"""
+    with _schedule_lock:
+        _due_dates.clear()
+        _overdue.clear()
+        for member_id, isbn, when in state.get("due", ()):
+            _due_dates[(member_id, isbn)] = when
+        for member_id, isbn in state.get("overdue", ()):
+            if (member_id, isbn) in _due_dates:
+                _overdue[(member_id, isbn)] = _due_dates[(member_id, isbn)]
+    _hold_queues.clear()
+    for isbn, queue in state.get("holds", {}).items():
+        _hold_queues[isbn] = deque(queue)
+    _rebuild_schedule()
+
+# Bulk entry points: rows are processed in chunks, validated together, and
+# reported as one status code per row in a compact array('B').
+BULK_CHUNK_SIZE = 10000
+BOOK_FIELDS = ("isbn", "title", "author", "genre", "total_copies")
+MEMBER_FIELDS = ("member_id", "name", "email")
+CIRCULATION_FIELDS = ("action", "member_id", "isbn")
+
+def _chunks(rows, fields, chunk_size):
+    """Yield lists of tuples from tuples, lists or dicts (e.g. csv.DictReader)"""
+    chunk = []
+    for row in rows:
+        if isinstance(row, dict):
+            row = tuple(row.get(field) for field in fields)
+        elif len(row) != len(fields):
+            row = None
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def add_books_bulk(rows, chunk_size=BULK_CHUNK_SIZE):
+    """Add many books; rows are (isbn, title, author, genre, total_copies)"""
+    statuses = array("B")
+    genre_set = frozenset(genres)
+    for chunk in _chunks(rows, BOOK_FIELDS, chunk_size):
+        # Validation pass over the whole chunk
+        codes = array("B", bytes(len(chunk)))
+        seen = set()
+        for i, row in enumerate(chunk):
+            if row is None or row[0] is None:
+                codes[i] = STATUS_INVALID_ROW
+                continue
+            isbn, title, author, genre, total_copies = row
+            if not isinstance(title, str) or not isinstance(author, str):
+                # e.g. a short line read with csv.DictReader
+                codes[i] = STATUS_INVALID_ROW
+            elif isbn in books or isbn in seen:
+                codes[i] = STATUS_BOOK_EXISTS
+            elif genre not in genre_set:
+                codes[i] = STATUS_INVALID_GENRE
+            else:
+                try:
+                    chunk[i] = (isbn, title, author, genre, int(total_copies))
+                except (TypeError, ValueError):
+                    codes[i] = STATUS_INVALID_ROW
+                    continue
+                seen.add(isbn)
+        # Insert pass for the rows that passed
+        for i, row in enumerate(chunk):
+            if codes[i]:
+                continue
+            isbn, title, author, genre, total_copies = row
+            with mutation_gate, _book_lock(isbn):
+                if isbn in books:
+                    # Added by another thread since the validation pass
+                    codes[i] = STATUS_BOOK_EXISTS
+                    continue
+                _insert_book(isbn, title, author, genre, total_copies)
+        statuses.extend(codes)
+    return statuses
+
+def add_members_bulk(rows, chunk_size=BULK_CHUNK_SIZE):
+    """Add many members; rows are (member_id, name, email)"""
+    statuses = array("B")
+    for chunk in _chunks(rows, MEMBER_FIELDS, chunk_size):
+        codes = array("B", bytes(len(chunk)))
+        seen = set()
+        for i, row in enumerate(chunk):
+            if row is None or row[0] is None:
+                codes[i] = STATUS_INVALID_ROW
+            elif row[0] in members or row[0] in seen:
+                codes[i] = STATUS_MEMBER_EXISTS
+            else:
+                seen.add(row[0])
+        for i, row in enumerate(chunk):
+            if codes[i]:
+                continue
+            member_id, name, email = row
+            with mutation_gate, _member_lock(member_id):
+                if member_id in members:
+                    codes[i] = STATUS_MEMBER_EXISTS
+                    continue
+                members.add({
+                    "member_id": member_id,
+                    "name": name,
+                    "email": email,
+                    "borrowed_books": []
+                })
+                _log("add_member", member_id, name, email)
+        statuses.extend(codes)
+    return statuses
+
+def apply_circulation_batch(events, chunk_size=BULK_CHUNK_SIZE):
+    """Apply ("borrow" | "return", member_id, isbn) events in order"""
+    statuses = array("B")
+    handlers = {"borrow": _borrow, "return": _return}
+    for chunk in _chunks(events, CIRCULATION_FIELDS, chunk_size):
+        codes = array("B", bytes(len(chunk)))
+        for i, event in enumerate(chunk):
+            handler = handlers.get(event[0]) if event is not None else None
+            if handler is None:
+                codes[i] = STATUS_INVALID_ROW
+            else:
+                codes[i] = handler(event[1], event[2])
+        statuses.extend(codes)
+    return statuses
+
 def get_all_books():
     """Utility function to get all books"""
     return books
 
+def find_member(member_id):
+    """Utility function to look up a member by ID (None if missing)"""
+    return members.get(member_id)
+
+def holders_of(isbn):
+    """IDs of the members currently borrowing a copy of `isbn`"""
+    return loans.holders_of(isbn)
+
+def loans_of(member_id):
+    """ISBNs currently borrowed by `member_id`"""
+    return loans.loans_of(member_id)
+
+def filter_books(genre=None, author=None, available=None,
+                 min_copies=None, max_copies=None):
+    """Books matching every given filter, as search_books-style dicts.
+
+    `author` is matched exactly but case-insensitively; `available=True`
+    keeps books with a copy on the shelf, `available=False` those without;
+    `min_copies`/`max_copies` bound total_copies.
+    """
+    with _facet_lock:
+        candidates = []
+        if genre is not None:
+            code = _genre_codes.get(genre)
+            if code is None:
+                return []
+            if available:
+                candidates.append(_genre_available[code])
+            else:
+                candidates.append(_genre_books[code])
+        if author is not None:
+            candidates.append(_author_books.get(author.lower(), set()))
+        if available and genre is None:
+            candidates.append(_available_books)
+        if candidates:
+            candidates.sort(key=len)
+            isbns = candidates[0].intersection(*candidates[1:])
+        else:
+            isbns = set(books)
+
+    results = []
+    for isbn in sorted(isbns, key=lambda isbn: _book_order.get(isbn, 0)):
+        book = books.get(isbn)
+        if book is None:
+            continue
+        if available is False and book.available_copies > 0:
+            continue
+        if min_copies is not None and book.total_copies < min_copies:
+            continue
+        if max_copies is not None and book.total_copies > max_copies:
+            continue
+        results.append(_book_result(isbn, book))
+    return results
+
+def genre_counts(available=False):
+    """Number of books per genre (only those with copies available if asked)"""
+    facets = _genre_available if available else _genre_books
+    with _facet_lock:
+        return {genre: len(facets[code]) for code, genre in enumerate(genres)}
+
+def search_cache_stats():
+    """Hit/miss/eviction counters and current size of the search cache"""
+    return search_cache.stats()
+
 def get_all_members():
     """Utility function to get all members"""
     return members
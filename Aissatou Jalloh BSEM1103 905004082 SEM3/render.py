@@ -0,0 +1,93 @@
+# render.py - Buffered, paged output of books and members for demo.py
+
+import sys
+
+CHUNK_SIZE = 256
+PAGE_SIZE = 50
+
+BOOK_TABLE = "{:<15} {:<40} {:<25} {:<12} {:>9}\n"
+MEMBER_TABLE = "{:<12} {:<25} {:<30} {:>8}\n"
+
+def _fit(text, width):
+    text = str(text)
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+def book_blocks(books):
+    """One multi-line text block per book, in the layout demo.py always used"""
+    for isbn, book in books.items():
+        yield (f"ISBN: {isbn}\n"
+               f"  Title: {book['title']}\n"
+               f"  Author: {book['author']}\n"
+               f"  Genre: {book['genre']}\n"
+               f"  Copies: {book['available_copies']}/{book['total_copies']} available\n"
+               "\n")
+
+def book_rows(books):
+    """One fixed-width table row per book"""
+    for isbn, book in books.items():
+        yield BOOK_TABLE.format(_fit(isbn, 15), _fit(book["title"], 40),
+                                _fit(book["author"], 25), book["genre"],
+                                f"{book['available_copies']}/{book['total_copies']}")
+
+def book_table_header():
+    header = BOOK_TABLE.format("ISBN", "Title", "Author", "Genre", "Available")
+    return header + "-" * (len(header) - 1) + "\n"
+
+def member_blocks(members, books):
+    for member in members:
+        lines = [f"ID: {member['member_id']}\n",
+                 f"  Name: {member['name']}\n",
+                 f"  Email: {member['email']}\n",
+                 f"  Borrowed Books: {len(member['borrowed_books'])}\n"]
+        for isbn in member["borrowed_books"]:
+            book = books.get(isbn)
+            lines.append(f"    - {isbn}: {book['title'] if book else 'Unknown Book'}\n")
+        lines.append("\n")
+        yield "".join(lines)
+
+def member_rows(members):
+    for member in members:
+        yield MEMBER_TABLE.format(_fit(member["member_id"], 12), _fit(member["name"], 25),
+                                  _fit(member["email"], 30), len(member["borrowed_books"]))
+
+def member_table_header():
+    header = MEMBER_TABLE.format("ID", "Name", "Email", "Borrowed")
+    return header + "-" * (len(header) - 1) + "\n"
+
+def write_paged(blocks, out=None, page_size=PAGE_SIZE, pause=None,
+                chunk_size=CHUNK_SIZE, header=""):
+    """Write text blocks with one out.write() per chunk of `chunk_size`.
+
+    Between pages of `page_size` blocks, `pause` is called (if given); when
+    it returns False the listing stops. Returns the number of blocks written.
+    """
+    out = out or sys.stdout
+    buffer = [header] if header else []
+    written = 0
+    for block in blocks:
+        if pause is not None and page_size and written and written % page_size == 0:
+            # A full page is out and there is more to show
+            out.write("".join(buffer))
+            out.flush()
+            if not pause():
+                return written
+            buffer = [header] if header else []
+        buffer.append(block)
+        written += 1
+        if len(buffer) >= chunk_size:
+            out.write("".join(buffer))
+            buffer = []
+    if written:
+        out.write("".join(buffer))
+    out.flush()
+    return written
+
+def show_books(books, table=False, **options):
+    if table:
+        return write_paged(book_rows(books), header=book_table_header(), **options)
+    return write_paged(book_blocks(books), **options)
+
+def show_members(members, books, table=False, **options):
+    if table:
+        return write_paged(member_rows(members), header=member_table_header(), **options)
+    return write_paged(member_blocks(members, books), **options)
@@ -0,0 +1,332 @@
+# repository.py - Storage backends for the core library operations
+#
+# Covers books, members and loans only: holds, due dates, the change feed,
+# circulation stats and transactions live in operations.py alone. Used by
+# server.py --backend sqlite and bench_backends.py.
+
+import sqlite3
+import threading
+
+import operations
+
+class InMemoryRepository:
+    """Repository over the dicts in operations.py"""
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        return operations.add_book(isbn, title, author, genre, total_copies)
+
+    def add_member(self, member_id, name, email):
+        return operations.add_member(member_id, name, email)
+
+    def search_books(self, keyword):
+        return operations.search_books(keyword)
+
+    def update_book(self, isbn, **kwargs):
+        return operations.update_book(isbn, **kwargs)
+
+    def update_member(self, member_id, **kwargs):
+        return operations.update_member(member_id, **kwargs)
+
+    def delete_book(self, isbn):
+        return operations.delete_book(isbn)
+
+    def delete_member(self, member_id):
+        return operations.delete_member(member_id)
+
+    def borrow_book(self, member_id, isbn):
+        return operations.borrow_book(member_id, isbn)
+
+    def return_book(self, member_id, isbn):
+        return operations.return_book(member_id, isbn)
+
+    def find_book(self, isbn):
+        return operations.books.get(isbn)
+
+    def find_member(self, member_id):
+        return operations.find_member(member_id)
+
+    def iter_books(self):
+        return iter(operations.books.items())
+
+    def iter_members(self):
+        return iter(operations.members)
+
+    def close(self):
+        pass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    isbn TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    total_copies INTEGER NOT NULL,
+    available_copies INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_title ON books (title);
+CREATE INDEX IF NOT EXISTS books_author ON books (author);
+
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS loans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id TEXT NOT NULL,
+    isbn TEXT NOT NULL,
+    UNIQUE (member_id, isbn)
+);
+CREATE INDEX IF NOT EXISTS loans_isbn ON loans (isbn);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (
+    title, author, content='books', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts (rowid, title, author)
+    VALUES (new.id, new.title, new.author);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title, author)
+    VALUES ('delete', old.id, old.title, old.author);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title, author)
+    VALUES ('delete', old.id, old.title, old.author);
+    INSERT INTO books_fts (rowid, title, author)
+    VALUES (new.id, new.title, new.author);
+END;
+"""
+
+# Statements are kept as fixed strings so each connection's statement cache
+# prepares them once and reuses them on every call.
+BOOK_COLUMNS = "isbn, title, author, genre, total_copies, available_copies"
+SELECT_BOOK = f"SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?"
+SELECT_ALL_BOOKS = f"SELECT {BOOK_COLUMNS} FROM books ORDER BY id"
+SEARCH_BOOKS = (f"SELECT {BOOK_COLUMNS} FROM books WHERE id IN "
+                "(SELECT rowid FROM books_fts WHERE books_fts MATCH ?) ORDER BY id")
+INSERT_BOOK = f"INSERT INTO books ({BOOK_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+UPDATE_BOOK = ("UPDATE books SET title = ?, author = ?, genre = ?, total_copies = ?, "
+               "available_copies = ? WHERE isbn = ?")
+DELETE_BOOK = "DELETE FROM books WHERE isbn = ? AND available_copies >= total_copies"
+SELECT_MEMBER = "SELECT member_id, name, email FROM members WHERE member_id = ?"
+SELECT_ALL_MEMBERS = "SELECT member_id, name, email FROM members ORDER BY id"
+INSERT_MEMBER = "INSERT OR IGNORE INTO members (member_id, name, email) VALUES (?, ?, ?)"
+UPDATE_MEMBER = "UPDATE members SET name = ?, email = ? WHERE member_id = ?"
+DELETE_MEMBER = ("DELETE FROM members WHERE member_id = ? AND NOT EXISTS "
+                 "(SELECT 1 FROM loans WHERE loans.member_id = members.member_id)")
+SELECT_LOANS = "SELECT isbn FROM loans WHERE member_id = ? ORDER BY id"
+BORROW_CHECK = """
+SELECT
+    EXISTS (SELECT 1 FROM members WHERE member_id = :member_id),
+    (SELECT available_copies FROM books WHERE isbn = :isbn),
+    (SELECT COUNT(*) FROM loans WHERE member_id = :member_id),
+    EXISTS (SELECT 1 FROM loans WHERE member_id = :member_id AND isbn = :isbn)
+"""
+TAKE_COPY = ("UPDATE books SET available_copies = available_copies - 1 "
+             "WHERE isbn = ? AND available_copies > 0")
+GIVE_BACK_COPY = "UPDATE books SET available_copies = available_copies + 1 WHERE isbn = ?"
+INSERT_LOAN = "INSERT INTO loans (member_id, isbn) VALUES (?, ?)"
+DELETE_LOAN = "DELETE FROM loans WHERE member_id = ? AND isbn = ?"
+
+def _book_dict(row):
+    return {
+        "title": row[1],
+        "author": row[2],
+        "genre": row[3],
+        "total_copies": row[4],
+        "available_copies": row[5]
+    }
+
+class SQLiteRepository:
+    """Repository backed by a SQLite database file.
+
+    Each thread gets its own connection. Searches of three or more
+    characters go through an FTS5 trigram index; every result is still
+    checked against the same case-insensitive substring rule as
+    operations.search_books.
+    """
+
+    def __init__(self, path, statement_cache_size=64):
+        self.path = path
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._connection().conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False,
+                                   cached_statements=self.statement_cache_size)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return _Transaction(conn)
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        with self._connection() as conn:
+            if conn.execute(SELECT_BOOK, (isbn,)).fetchone() is not None:
+                return False, "Book already exists."
+            if genre not in operations.genres:
+                return False, "Invalid genre."
+            conn.execute(INSERT_BOOK, (isbn, title, author, genre,
+                                       total_copies, total_copies))
+        return True, "Book added successfully."
+
+    def add_member(self, member_id, name, email):
+        with self._connection() as conn:
+            cursor = conn.execute(INSERT_MEMBER, (member_id, name, email))
+        if cursor.rowcount == 0:
+            return False, "Member already exists."
+        return True, "Member added successfully."
+
+    def search_books(self, keyword):
+        keyword = keyword.lower()
+        conn = self._connection().conn
+        if len(keyword) >= 3:
+            # Quote the keyword so FTS5 treats it as one literal phrase
+            rows = conn.execute(SEARCH_BOOKS, ('"' + keyword.replace('"', '""') + '"',))
+        else:
+            rows = conn.execute(SELECT_ALL_BOOKS)
+        results = []
+        for row in rows:
+            if keyword in row[1].lower() or keyword in row[2].lower():
+                result = {"isbn": row[0]}
+                result.update(_book_dict(row))
+                results.append(result)
+        return results
+
+    def update_book(self, isbn, **kwargs):
+        with self._connection() as conn:
+            row = conn.execute(SELECT_BOOK, (isbn,)).fetchone()
+            if row is None:
+                return False, "Book not found."
+            book = _book_dict(row)
+            result = operations.apply_book_updates(book, kwargs)
+            # Fields before a rejected one stay applied, as in operations.py
+            conn.execute(UPDATE_BOOK, (book["title"], book["author"], book["genre"],
+                                       book["total_copies"], book["available_copies"],
+                                       isbn))
+        return result
+
+    def update_member(self, member_id, **kwargs):
+        with self._connection() as conn:
+            row = conn.execute(SELECT_MEMBER, (member_id,)).fetchone()
+            if row is None:
+                return False, "Member not found."
+            name = kwargs.get("name", row[1])
+            email = kwargs.get("email", row[2])
+            conn.execute(UPDATE_MEMBER, (name, email, member_id))
+        return True, "Member updated successfully."
+
+    def delete_book(self, isbn):
+        with self._connection() as conn:
+            cursor = conn.execute(DELETE_BOOK, (isbn,))
+            if cursor.rowcount:
+                return True, "Book deleted successfully."
+            if conn.execute(SELECT_BOOK, (isbn,)).fetchone() is None:
+                return False, "Book not found."
+        return False, "Cannot delete book - copies are currently borrowed"
+
+    def delete_member(self, member_id):
+        with self._connection() as conn:
+            cursor = conn.execute(DELETE_MEMBER, (member_id,))
+            if cursor.rowcount:
+                return True, "Member deleted successfully."
+            if conn.execute(SELECT_MEMBER, (member_id,)).fetchone() is None:
+                return False, "Member not found."
+        return False, "Cannot delete member - they have borrowed books"
+
+    def borrow_book(self, member_id, isbn):
+        with self._connection() as conn:
+            member_exists, available, borrowed, has_book = conn.execute(
+                BORROW_CHECK, {"member_id": member_id, "isbn": isbn}).fetchone()
+            if not member_exists:
+                return False, "Member not found."
+            if available is None:
+                return False, "Book not found."
+            if borrowed >= operations.BORROW_LIMIT:
+                return False, "Borrow limit reached."
+            if available <= 0:
+                return False, "No copies available."
+            if has_book:
+                return False, "Member already has this book borrowed."
+            conn.execute(TAKE_COPY, (isbn,))
+            conn.execute(INSERT_LOAN, (member_id, isbn))
+        return True, "Book borrowed successfully."
+
+    def return_book(self, member_id, isbn):
+        with self._connection() as conn:
+            if conn.execute(SELECT_MEMBER, (member_id,)).fetchone() is None:
+                return False, "Member not found."
+            if conn.execute(SELECT_BOOK, (isbn,)).fetchone() is None:
+                return False, "Book not found."
+            if conn.execute(DELETE_LOAN, (member_id, isbn)).rowcount == 0:
+                return False, "Book not borrowed by this member."
+            conn.execute(GIVE_BACK_COPY, (isbn,))
+        return True, "Book returned successfully."
+
+    def find_book(self, isbn):
+        row = self._connection().conn.execute(SELECT_BOOK, (isbn,)).fetchone()
+        return _book_dict(row) if row else None
+
+    def find_member(self, member_id):
+        conn = self._connection().conn
+        row = conn.execute(SELECT_MEMBER, (member_id,)).fetchone()
+        if row is None:
+            return None
+        return self._member_dict(conn, row)
+
+    def iter_books(self):
+        for row in self._connection().conn.execute(SELECT_ALL_BOOKS):
+            yield row[0], _book_dict(row)
+
+    def iter_members(self):
+        conn = self._connection().conn
+        for row in conn.execute(SELECT_ALL_MEMBERS):
+            yield self._member_dict(conn, row)
+
+    def _member_dict(self, conn, row):
+        return {
+            "member_id": row[0],
+            "name": row[1],
+            "email": row[2],
+            "borrowed_books": [loan[0] for loan in conn.execute(SELECT_LOANS, (row[0],))]
+        }
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+class _Transaction:
+    """`with` block that runs its statements in one IMMEDIATE transaction"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def open_repository(kind="memory", path=None):
+    """Return a repository: "memory" for operations.py, "sqlite" for a database file"""
+    if kind == "memory":
+        return InMemoryRepository()
+    if kind == "sqlite":
+        return SQLiteRepository(path or "library.db")
+    raise ValueError(f"Unknown repository kind: {kind}")
@@ -0,0 +1,162 @@
+# server.py - Asyncio JSON-over-TCP front end for operations.py
+# (or, with --backend sqlite, for a repository.py SQLite database)
+#
+# Protocol: one JSON object per line in each direction.
+#   request:  {"id": 7, "op": "borrow_book", "args": ["M001", "001"], "kwargs": {}}
+#   response: {"id": 7, "result": [true, "Book borrowed successfully."]}
+#         or  {"id": 7, "error": "Unknown operation: ..."}
+# Clients may pipeline: send many requests without waiting. Responses come
+# back in request order on the same connection.
+
+import argparse
+import asyncio
+import json
+
+import operations
+
+# Everything a client may call, by name. Functions are looked up on each
+# call so wrappers installed on operations.py later are picked up.
+OPERATIONS = frozenset((
+    "add_book", "add_member", "search_books", "search_books_page",
+    "update_book", "update_member", "delete_book", "delete_member",
+    "borrow_book", "return_book", "get_all_books", "get_all_members",
+    "find_member", "holders_of", "loans_of", "add_books_bulk", "add_members_bulk",
+    "apply_circulation_batch", "search_cache_stats", "filter_books",
+    "genre_counts", "place_hold", "cancel_hold", "holds_for", "due_date",
+    "next_due", "overdue_loans", "sweep_overdue", "apply_transaction",
+    "fuzzy_search_books", "read_changes", "circulation_stats", "most_borrowed",
+    "most_active_members",
+))
+READ_ONLY = {"search_books", "search_books_page", "get_all_books",
+             "get_all_members", "find_member", "holders_of", "loans_of",
+             "search_cache_stats", "filter_books", "genre_counts", "holds_for",
+             "due_date", "next_due", "overdue_loans", "fuzzy_search_books",
+             "read_changes", "circulation_stats", "most_borrowed", "most_active_members"}
+# The subset a repository.py backend implements
+REPOSITORY_OPERATIONS = frozenset((
+    "add_book", "add_member", "search_books", "update_book", "update_member",
+    "delete_book", "delete_member", "borrow_book", "return_book", "find_member",
+))
+READ_SIZE = 65536
+# Longest partial line kept while waiting for its newline
+MAX_PENDING = READ_SIZE * 4
+
+def _to_json(value):
+    # Book records, the member store and status arrays
+    if hasattr(value, "keys"):
+        return dict(value)
+    return list(value)
+
+def _encode(response):
+    return json.dumps(response, separators=(",", ":"), default=_to_json).encode() + b"\n"
+
+def execute(line, repository=None):
+    """Run one request line; returns (response bytes, whether it wrote)
+
+    Requests go to operations.py, or to repository when one is given.
+    """
+    try:
+        request = json.loads(line)
+        request_id = request.get("id")
+    except (ValueError, AttributeError):
+        return _encode({"id": None, "error": "Malformed request"}), False
+    op = request.get("op")
+    if op not in (OPERATIONS if repository is None else REPOSITORY_OPERATIONS):
+        return _encode({"id": request_id, "error": f"Unknown operation: {op}"}), False
+    target = operations if repository is None else repository
+    try:
+        result = getattr(target, op)(*request.get("args", ()), **request.get("kwargs", {}))
+    except Exception as error:
+        return _encode({"id": request_id, "error": f"{type(error).__name__}: {error}"}), True
+    return _encode({"id": request_id, "result": result}), op not in READ_ONLY
+
+class LibraryServer:
+    """Serves operations.py to many clients on one event loop.
+
+    Each read from a socket may carry several pipelined requests. They run
+    as one batch. If a storage journal is attached, the batch's writes are
+    fsync'd once before any of its responses go out. With a repository,
+    requests go to it instead and it commits its own writes.
+    """
+
+    def __init__(self, store=None, repository=None):
+        self.store = store
+        self.repository = repository
+        self.requests_served = 0
+        self.open_connections = 0
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        pending = b""
+        self.open_connections += 1
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                if len(pending) > MAX_PENDING:
+                    writer.write(_encode({"id": None, "error": "Request line too long"}))
+                    await writer.drain()
+                    break
+                responses = []
+                wrote = False
+                for line in lines:
+                    if line.strip():
+                        response, changed = execute(line, self.repository)
+                        responses.append(response)
+                        wrote = wrote or changed
+                self.requests_served += len(responses)
+                if wrote and self.store is not None:
+                    # Group commit: one fsync covers every write in the batch
+                    await loop.run_in_executor(None, self.store.sync)
+                writer.write(b"".join(responses))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.open_connections -= 1
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port,
+                                            limit=READ_SIZE)
+        address = server.sockets[0].getsockname()
+        print(f"Library server listening on {address[0]}:{address[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve operations.py over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", help="storage directory (in-memory only if omitted)")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory",
+                        help="sqlite serves the core operations from --db")
+    parser.add_argument("--db", default="library.db", help="SQLite database file")
+    args = parser.parse_args()
+    if args.backend == "sqlite" and args.data_dir:
+        parser.error("--data-dir applies to the memory backend only")
+
+    store = None
+    repository = None
+    if args.backend == "sqlite":
+        import repository as repositories
+        repository = repositories.open_repository("sqlite", args.db)
+    elif args.data_dir:
+        import storage
+        # Batches are synced explicitly, so don't sync on record count
+        store = storage.open_storage(args.data_dir, sync_every=1 << 30)
+    try:
+        asyncio.run(LibraryServer(store, repository).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        if repository is not None:
+            repository.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# sharded.py - Book catalog split across worker processes
+#
+#   catalog = ShardedCatalog(shards=4)
+#   catalog.add_books_bulk(rows)
+#   catalog.search_books("python")
+#   catalog.close()
+#
+# Each shard is a separate Python process with its own copy of operations.py
+# holding the books whose ISBN hashes to it. A search is sent to every shard
+# at once, so the shards scan their parts of the catalog on different cores
+# in parallel; the coordinator merges their already-sorted answers. Adds,
+# updates and deletes go only to the shard that owns the ISBN.
+#
+# Only the catalog is sharded. Members and loans stay in the main process
+# (operations.py), since the borrow limit needs to see all of a member's loans.
+# Borrows and returns never reach the shards, so a shard can't know how
+# many copies are on the shelf: results leave out "available_copies".
+# Look that up in operations.books (or filter_books) when it is needed.
+
+import heapq
+import itertools
+import multiprocessing
+import zlib
+from array import array
+
+import operations
+
+def shard_of(isbn, shard_count):
+    """Owning shard for an ISBN; crc32 is the same in every process"""
+    return zlib.crc32(str(isbn).encode()) % shard_count
+
+def _search(keyword, ranked, limit, order):
+    """(rank, catalog position, isbn) for one shard's first `limit` matches.
+
+    No records are built here: the coordinator asks for the ones it
+    returns once it knows which they are.
+    """
+    keyword = keyword.lower()
+    hits = []
+    for isbn in operations._matching_isbns(keyword, ranked)[:limit]:
+        book = operations.books.get(isbn)
+        if book is None or isbn not in order:
+            continue
+        rank = operations._match_rank(keyword, book) if ranked else 0
+        hits.append((rank, order[isbn], isbn))
+    return hits
+
+def _records(isbns):
+    results = []
+    for result in map(operations._book_result, isbns):
+        if result is not None:
+            # Never changes in a shard, so it would be stale; see the top of the file
+            del result["available_copies"]
+            results.append(result)
+    return results
+
+def _worker(connection, cache_entries):
+    """Shard main loop: run requests from the coordinator until told to stop"""
+    operations.search_cache.max_entries = cache_entries
+    # Global catalog position of each book, so shards can be merged in
+    # the same order one process would have returned
+    order = {}
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        command, args = request
+        try:
+            if command == "search":
+                result = _search(*args, order)
+            elif command == "records":
+                result = _records(*args)
+            elif command == "add_books":
+                rows, positions = args
+                statuses = operations.add_books_bulk(rows)
+                for row, position, status in zip(rows, positions, statuses):
+                    if status == operations.STATUS_OK:
+                        order[row[0]] = position
+                result = statuses
+            elif command == "update_book":
+                isbn, kwargs = args
+                result = operations.update_book(isbn, **kwargs)
+            elif command == "delete_book":
+                result = operations.delete_book(*args)
+                if result[0]:
+                    order.pop(args[0], None)
+            elif command == "count":
+                result = len(operations.books)
+            else:
+                result = ValueError(f"Unknown shard command: {command}")
+        except Exception as error:
+            result = error
+        connection.send(result)
+    connection.close()
+
+class ShardedCatalog:
+    """The book catalog partitioned by ISBN hash over `shards` processes.
+
+    Calls return the same results as the matching operations.py function
+    would for the whole catalog, except that search results have no
+    "available_copies": circulation is not routed to the shards.
+    """
+
+    def __init__(self, shards=None, cache_entries=1024):
+        # spawn, not fork: each shard starts from an empty operations.py
+        context = multiprocessing.get_context("spawn")
+        self.shard_count = shards or multiprocessing.cpu_count()
+        self._positions = itertools.count()
+        self._connections = []
+        self._processes = []
+        for _ in range(self.shard_count):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(child, cache_entries), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    def _ask(self, shard, command, *args):
+        connection = self._connections[shard]
+        connection.send((command, args))
+        return self._answer(connection)
+
+    def _answer(self, connection):
+        result = connection.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _ask_all(self, command, *args):
+        # Send to every shard before waiting, so they all work at once
+        for connection in self._connections:
+            connection.send((command, args))
+        return [self._answer(connection) for connection in self._connections]
+
+    def _owner(self, isbn):
+        return shard_of(isbn, self.shard_count)
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        status = self.add_books_bulk([(isbn, title, author, genre, total_copies)])[0]
+        if status != operations.STATUS_OK:
+            return False, operations.STATUS_MESSAGES[status]
+        return True, "Book added successfully."
+
+    def add_books_bulk(self, rows):
+        """Route each row to its shard; returns one status code per row.
+
+        Rows may be tuples, lists or dicts, as for operations.add_books_bulk.
+        """
+        # Same normalisation as operations.add_books_bulk: dict rows become
+        # tuples in BOOK_FIELDS order, rows of the wrong length become None
+        rows = [row for chunk in operations._chunks(rows, operations.BOOK_FIELDS,
+                                                    operations.BULK_CHUNK_SIZE)
+                for row in chunk]
+        routed = [[] for _ in range(self.shard_count)]
+        for index, row in enumerate(rows):
+            if row is not None:
+                routed[self._owner(row[0])].append((index, row, next(self._positions)))
+        for shard, batch in enumerate(routed):
+            if batch:
+                self._connections[shard].send(
+                    ("add_books", ([row for _, row, _ in batch],
+                                   [position for _, _, position in batch])))
+        statuses = array("B", [operations.STATUS_INVALID_ROW]) * len(rows)
+        for shard, batch in enumerate(routed):
+            if batch:
+                codes = self._answer(self._connections[shard])
+                for (index, _, _), code in zip(batch, codes):
+                    statuses[index] = code
+        return statuses
+
+    def update_book(self, isbn, **kwargs):
+        return self._ask(self._owner(isbn), "update_book", isbn, kwargs)
+
+    def delete_book(self, isbn):
+        return self._ask(self._owner(isbn), "delete_book", isbn)
+
+    def search_books(self, keyword, ranked=False):
+        return self._records([hit[2] for hit in self._merged(keyword, ranked)])
+
+    def search_books_page(self, keyword, limit=10, cursor=None, ranked=False):
+        """Same (results, next_cursor) contract as operations.search_books_page"""
+        offset = operations.page_offset(cursor)
+        # No shard needs to send more than the rows up to the end of the page
+        hits = list(itertools.islice(self._merged(keyword, ranked, offset + limit + 1),
+                                     offset, offset + limit + 1))
+        page = self._records([hit[2] for hit in hits[:limit]])
+        if len(hits) > limit:
+            return page, str(offset + limit)
+        return page, None
+
+    def _records(self, isbns):
+        """Result records for `isbns`, fetched from their shards, in the same order"""
+        wanted = [[] for _ in range(self.shard_count)]
+        for isbn in isbns:
+            wanted[self._owner(isbn)].append(isbn)
+        for shard, batch in enumerate(wanted):
+            if batch:
+                self._connections[shard].send(("records", (batch,)))
+        found = {}
+        for shard, batch in enumerate(wanted):
+            if batch:
+                for result in self._answer(self._connections[shard]):
+                    found[result["isbn"]] = result
+        # Books deleted since the search are left out
+        return [found[isbn] for isbn in isbns if isbn in found]
+
+    def _merged(self, keyword, ranked, limit=None):
+        answers = self._ask_all("search", keyword, ranked, limit)
+        return heapq.merge(*answers, key=lambda hit: (hit[0], hit[1]))
+
+    def book_count(self):
+        return sum(self._ask_all("count"))
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,192 @@
+# storage.py - Write-ahead log and snapshots for operations.py
+
+import json
+import os
+import sys
+import threading
+import time
+
+import operations
+
+SNAPSHOT_FILE = "snapshot.json"
+WAL_FILE = "wal.log"
+
+class Storage:
+    """Persists the library by logging every mutation to an append-only file.
+
+    Log records are written as JSON lines and fsync'd in groups: after
+    `sync_every` records, or at most `sync_interval` seconds after the first
+    unsynced one. After `snapshot_every` records the background thread
+    writes the whole library to a compact snapshot and the log starts again
+    from empty, so recovery is one snapshot load plus a short replay.
+    """
+
+    def __init__(self, directory, sync_every=64, sync_interval=0.05,
+                 snapshot_every=10000):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._wal = None
+        self._pending = 0
+        self._since_snapshot = 0
+        self._snapshot_due = False
+        self._closed = threading.Event()
+        self._flusher = None
+        # (line number, error) for log records that failed on replay
+        self.skipped = []
+
+    def open(self):
+        """Load the snapshot, replay the log and start journaling"""
+        os.makedirs(self.directory, exist_ok=True)
+        operations.journal = None
+        self._load_snapshot()
+        self._since_snapshot = self._replay()
+        self._wal = open(self._path(WAL_FILE), "a", encoding="utf-8")
+        operations.journal = self
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        return self
+
+    def close(self):
+        """Flush outstanding records and stop journaling"""
+        if operations.journal is self:
+            operations.journal = None
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._wal is not None:
+                self._sync()
+                self._wal.close()
+                self._wal = None
+
+    def append(self, op, args, kwargs):
+        record = json.dumps([op, list(args), kwargs], separators=(",", ":"))
+        with self._lock:
+            self._wal.write(record + "\n")
+            self._pending += 1
+            self._since_snapshot += 1
+            if self._since_snapshot >= self.snapshot_every:
+                # Taken by the flusher: this thread is inside a mutation,
+                # and a snapshot has to wait until none is running
+                self._snapshot_due = True
+            if self._pending >= self.sync_every:
+                self._sync()
+
+    def sync(self):
+        """Force every logged record to disk"""
+        with self._lock:
+            self._sync()
+
+    def snapshot(self):
+        """Write a snapshot now and truncate the log (not from inside a mutation)"""
+        with operations.mutation_gate.quiesce(), self._lock:
+            self._snapshot()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _sync(self):
+        if self._pending:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._pending = 0
+
+    def _flush_loop(self):
+        # Group commit: records that did not fill a batch are synced shortly
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                if self._wal is not None:
+                    self._sync()
+            if self._snapshot_due:
+                self.snapshot()
+
+    def _snapshot(self):
+        # Called with mutations stopped, so every record is consistent and
+        # the log being truncated holds exactly what the snapshot contains
+        state = {
+            "books": dict(operations.books),
+            "members": list(operations.members),
+            "schedule": operations.schedule_state(),
+            "stats": operations.stats_state(),
+        }
+        data = json.dumps(state, separators=(",", ":"), default=dict)
+        tmp_path = self._path(SNAPSHOT_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(SNAPSHOT_FILE))
+        # Everything logged so far is in the snapshot; start a fresh log
+        self._wal.close()
+        self._wal = open(self._path(WAL_FILE), "w", encoding="utf-8")
+        os.fsync(self._wal.fileno())
+        self._pending = 0
+        self._since_snapshot = 0
+        self._snapshot_due = False
+
+    def _load_snapshot(self):
+        operations.books.clear()
+        operations.members.clear()
+        path = self._path(SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            for isbn, record in state["books"].items():
+                operations.books[isbn] = operations.Book.from_dict(record)
+            for member in state["members"]:
+                operations.members.add(member)
+            operations.rebuild_indexes()
+            operations.restore_schedule(state.get("schedule", {}))
+            operations.restore_stats(state.get("stats", {}))
+        else:
+            operations.rebuild_indexes()
+            operations.restore_stats({})
+
+    def _replay(self):
+        path = self._path(WAL_FILE)
+        if not os.path.exists(path):
+            return 0
+        replayed = 0
+        # Borrows that fulfilled holds are in the log already, and the
+        # changes being replayed were announced before the restart
+        operations.fulfil_holds = False
+        operations.change_log.enabled = False
+        try:
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        op, args, kwargs = json.loads(line)
+                    except ValueError:
+                        # A torn final record from a crash mid-write
+                        break
+                    try:
+                        getattr(operations, op)(*args, **kwargs)
+                    except Exception as error:
+                        # One bad record must not make the library unrecoverable
+                        self.skipped.append((number, f"{type(error).__name__}: {error}"))
+                        sys.stderr.write(f"{self._path(WAL_FILE)}:{number}: skipped {op}: "
+                                         f"{type(error).__name__}: {error}\n")
+                        continue
+                    replayed += 1
+        finally:
+            operations.fulfil_holds = True
+            operations.change_log.enabled = True
+        return replayed
+
+def open_storage(directory, **options):
+    """Restore the library from `directory` and log all further changes to it"""
+    return Storage(directory, **options).open()
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "library_data"
+    start = time.perf_counter()
+    store = open_storage(directory)
+    elapsed = time.perf_counter() - start
+    print(f"Recovered {len(operations.books)} books and "
+          f"{len(operations.members)} members in {elapsed:.3f}s")
+    store.snapshot()
+    store.close()
+    print("Snapshot written.")
@@ -1,6 +1,25 @@
 # tests.py - Unit Tests for Library Management System
 
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+
+import catalog_snapshot
+import demo
+import import_export
+import metrics
 import operations
+import render
+import repository
+import server
+import sharded
+import storage
 
 def run_tests():
     print("Running Library Management System Tests...")
@@ -9,6 +28,7 @@ def run_tests():
     # Clear data before tests
     operations.books.clear()
     operations.members.clear()
+    operations.rebuild_indexes()
     
     # Test 1: add_book()
     print("\n1. Testing add_book()...")
@@ -183,6 +203,1012 @@ def run_tests():
     assert "limit" in message
     print(" borrow_book() - Borrow limit test passed")
     
+    # Test 11: member store
+    print("\n11. Testing member store...")
+    operations.add_member("M003", "Carol", "carol@example.com")
+    assert operations.find_member("M003")["name"] == "Carol"
+    assert operations.find_member("M999") is None
+    member_ids = [m["member_id"] for m in operations.get_all_members()]
+    assert member_ids == ["M001", "M003"]
+    operations.delete_member("M003")
+    assert "M003" not in operations.members
+    assert len(operations.members) == 1
+    print(" find_member() - Lookup and ordering test passed")
+    
+    # Test 12: search index
+    print("\n12. Testing search index...")
+    operations.add_book("009", "The Pythonic Way", "Ann Lee", "Fiction", 1)
+    operations.update_book("009", title="Ruby Ways", author="Lee Ann Python")
+    operations.delete_book("004")  # Already gone, should be a no-op
+    for keyword in ["", "p", "PY", "pyt", "python", "ee an", "ways", "Way", "xyz"]:
+        expected = [isbn for isbn, book in operations.books.items()
+                    if keyword.lower() in book["title"].lower()
+                    or keyword.lower() in book["author"].lower()]
+        assert [b["isbn"] for b in operations.search_books(keyword)] == expected
+    assert operations.search_books("Pythonic") == []
+    print(" search_books() - Index matches full scan test passed")
+    
+    # Test 13: paged and ranked search
+    print("\n13. Testing paged search...")
+    all_results = operations.search_books("a")
+    seen = []
+    page, cursor = operations.search_books_page("a", limit=3)
+    while True:
+        assert len(page) <= 3
+        seen.extend(page)
+        if cursor is None:
+            break
+        page, cursor = operations.search_books_page("a", limit=3, cursor=cursor)
+    assert seen == all_results
+    for cursor in ("-2", "page two"):
+        try:
+            operations.search_books_page("a", limit=3, cursor=cursor)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    operations.add_book("010", "CPython Internals", "Guido", "Non-Fiction", 2)
+    ranked = [b["isbn"] for b in operations.iter_search_books("python", ranked=True)]
+    assert ranked == ["001", "003", "010", "009"]  # word prefix, infix, author
+    assert operations._match_rank("python", {"title": "CPython and Python", "author": ""}) == 0
+    assert operations._match_rank("python", {"title": "CPython, IPython", "author": ""}) == 1
+    print(" search_books_page() - Paging and ranking test passed")
+    
+    # Test 14: write-ahead log and snapshots
+    print("\n14. Testing storage...")
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = storage.open_storage(data_dir, snapshot_every=5)
+        operations.add_book("101", "Stored Book", "Writer", "History", 2)
+        operations.add_member("M101", "Dana", "dana@example.com")
+        operations.borrow_book("M101", "101")
+        operations.update_book("101", title="Stored Title")
+        operations.update_member("M101", email="dana@example.org")
+        operations.add_book("102", "Logged Book", "Writer", "History", 1)  # After snapshot
+        operations.delete_book("102")
+        store.close()
+        expected_books = {isbn: dict(book) for isbn, book in operations.books.items()}
+        
+        store = storage.open_storage(data_dir)
+        assert operations.books == expected_books
+        assert operations.find_member("M101")["email"] == "dana@example.org"
+        assert operations.find_member("M101")["borrowed_books"] == ["101"]
+        assert [b["isbn"] for b in operations.search_books("stored")] == ["101"]
+        
+        # Only applied fields are logged; a value that raises is not
+        try:
+            operations.update_book("101", title="Typed Title", total_copies="5")
+            assert False, "expected TypeError"
+        except TypeError:
+            pass
+        assert operations.update_book("101", genre="Poetry") == (False, "Invalid genre.")
+        store.close()
+        with open(os.path.join(data_dir, storage.WAL_FILE), encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert records[-1] == ["update_book", ["101"], {"title": "Typed Title"}]
+        
+        # A bad record is skipped and reported instead of stopping recovery
+        with open(os.path.join(data_dir, storage.WAL_FILE), "a", encoding="utf-8") as f:
+            f.write('["update_book",["101"],{"total_copies":"5"}]\n')
+            f.write('["update_member",["M101"],{"name":"Dana B"}]\n')
+        stderr, sys.stderr = sys.stderr, io.StringIO()
+        try:
+            store = storage.open_storage(data_dir)
+        finally:
+            sys.stderr = stderr
+        assert [number for number, _ in store.skipped] == [len(records) + 1]
+        assert operations.books["101"]["title"] == "Typed Title"
+        assert operations.find_member("M101")["name"] == "Dana B"
+        
+        # A snapshot asked for in the middle of a borrow waits for it to finish
+        operations.add_book("103", "Last Copy", "Writer", "History", 1)
+        refresh = operations._refresh_availability
+        snapshotter = threading.Thread(target=store.snapshot)
+        def refresh_mid_borrow(isbn, book):
+            snapshotter.start()
+            snapshotter.join(0.2)
+            assert snapshotter.is_alive()  # The copy is gone but the loan isn't recorded yet
+            refresh(isbn, book)
+        operations._refresh_availability = refresh_mid_borrow
+        try:
+            assert operations.borrow_book("M101", "103")[0]
+        finally:
+            operations._refresh_availability = refresh
+        snapshotter.join()
+        store.close()
+        store = storage.open_storage(data_dir)
+        assert operations.books["103"]["available_copies"] == 0
+        assert "103" in operations.find_member("M101")["borrowed_books"]
+        store.close()
+    print(" Storage - Snapshot and log recovery test passed")
+    
+    # Test 15: SQLite repository
+    print("\n15. Testing SQLite repository...")
+    with tempfile.TemporaryDirectory() as data_dir:
+        repo = repository.open_repository("sqlite", os.path.join(data_dir, "library.db"))
+        assert repo.add_book("201", "Python Basics", "Jane Smith", "Fiction", 1)[0]
+        assert not repo.add_book("201", "Again", "Jane Smith", "Fiction", 1)[0]
+        assert repo.add_book("202", "Gardens", "Py Author", "History", 2)[0]
+        assert repo.add_member("M201", "Eve", "eve@example.com")[0]
+        assert [b["isbn"] for b in repo.search_books("py")] == ["201", "202"]
+        assert [b["isbn"] for b in repo.search_books("SMITH")] == ["201"]
+        assert repo.borrow_book("M201", "201") == (True, "Book borrowed successfully.")
+        assert repo.borrow_book("M201", "201") == (False, "No copies available.")
+        assert repo.find_book("201")["available_copies"] == 0
+        assert repo.find_member("M201")["borrowed_books"] == ["201"]
+        assert not repo.delete_book("201")[0]
+        assert repo.return_book("M201", "201")[0]
+        assert repo.delete_book("201")[0]
+        assert repo.delete_member("M201")[0]
+        repo.close()
+    print(" SQLiteRepository - Parity test passed")
+    
+    # Test 16: concurrent borrowing and returning
+    print("\n16. Testing concurrent circulation...")
+    stress_isbns = [f"30{i}" for i in range(4)]
+    for isbn in stress_isbns:
+        operations.add_book(isbn, "Stress Book", "Author", "Fiction", 3)
+    stress_members = [f"M3{i:02d}" for i in range(12)]
+    for member_id in stress_members:
+        operations.add_member(member_id, "Stress", "stress@example.com")
+    
+    def churn(seed):
+        rng = random.Random(seed)
+        for _ in range(5000):
+            member_id = rng.choice(stress_members)
+            isbn = rng.choice(stress_isbns)
+            if rng.random() < 0.5:
+                operations.borrow_book(member_id, isbn)
+            else:
+                operations.return_book(member_id, isbn)
+    
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        threads = [threading.Thread(target=churn, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    
+    for isbn in stress_isbns:
+        holders = [m for m in stress_members
+                   if isbn in operations.find_member(m)["borrowed_books"]]
+        assert sorted(operations.holders_of(isbn)) == holders
+        book = operations.books[isbn]
+        assert 0 <= book["available_copies"] <= book["total_copies"]
+        assert book["available_copies"] + len(holders) == book["total_copies"]
+    for member_id in stress_members:
+        borrowed = operations.find_member(member_id)["borrowed_books"]
+        assert len(borrowed) <= 3
+        assert len(set(borrowed)) == len(borrowed)
+    
+    # Locks come from fixed pools: lookups of unknown IDs leave nothing behind
+    for i in range(2000):
+        operations.borrow_book(f"ghost{i}", f"nobook{i}")
+    assert len(operations._member_locks) == len(operations._book_locks) == operations.LOCK_STRIPES
+    # Two members sharing a pool lock in one transaction take it once
+    slot = operations._lock_slot("MT")
+    twin = next(f"MT{i}" for i in itertools.count() if operations._lock_slot(f"MT{i}") == slot)
+    operations.add_member("MT", "Twin", "twin@example.com")
+    operations.add_member(twin, "Twin", "twin@example.com")
+    operations.add_book("310", "Shared Lock", "Author", "Fiction", 2)
+    assert operations.apply_transaction([("borrow", "MT", "310"), ("borrow", twin, "310")])[0]
+    assert operations.apply_transaction([("return", "MT", "310"), ("return", twin, "310")])[0]
+    for member_id in ("MT", twin):
+        operations.delete_member(member_id)
+    operations.delete_book("310")
+    assert operations._book_result("no such book") is None
+    print(" borrow_book()/return_book() - Thread safety test passed")
+    
+    # Test 17: bulk API
+    print("\n17. Testing bulk API...")
+    rows = (row for row in [
+        ("401", "Bulk One", "Feed", "Fiction", 2),
+        {"isbn": "402", "title": "Bulk Two", "author": "Feed",
+         "genre": "History", "total_copies": "1"},
+        ("401", "Duplicate In Feed", "Feed", "Fiction", 1),
+        ("403", "Bad Genre", "Feed", "Poetry", 1),
+        ("404", "Bad Copies", "Feed", "Fiction", "many"),
+        ("405", "Too Short"),
+    ])
+    statuses = operations.add_books_bulk(rows, chunk_size=4)
+    assert list(statuses) == [operations.STATUS_OK, operations.STATUS_OK,
+                              operations.STATUS_BOOK_EXISTS, operations.STATUS_INVALID_GENRE,
+                              operations.STATUS_INVALID_ROW, operations.STATUS_INVALID_ROW]
+    assert operations.books["402"]["available_copies"] == 1
+    assert [b["isbn"] for b in operations.search_books("bulk")] == ["401", "402"]
+    # A DictReader row from a short line has None for the missing fields
+    assert list(operations.add_books_bulk([{"isbn": "406", "genre": "Fiction",
+                                            "total_copies": 1}])) == [operations.STATUS_INVALID_ROW]
+    assert "406" not in operations.books
+    try:
+        operations.add_book("407", None, "Feed", "Fiction", 1)
+        assert False, "expected AttributeError"
+    except AttributeError:
+        pass
+    assert "407" not in operations.books and "407" not in operations._book_order
+    
+    statuses = operations.add_members_bulk([("M401", "Fay", "fay@example.com"),
+                                            ("M401", "Fay", "fay@example.com")])
+    assert list(statuses) == [operations.STATUS_OK, operations.STATUS_MEMBER_EXISTS]
+    
+    statuses = operations.apply_circulation_batch([
+        ("borrow", "M401", "401"),
+        ("borrow", "M401", "401"),
+        ("return", "M401", "402"),
+        ("return", "M401", "401"),
+        ("renew", "M401", "401"),
+    ])
+    assert list(statuses) == [operations.STATUS_OK, operations.STATUS_ALREADY_BORROWED,
+                              operations.STATUS_NOT_BORROWED, operations.STATUS_OK,
+                              operations.STATUS_INVALID_ROW]
+    assert operations.books["401"]["available_copies"] == 2
+    print(" Bulk API - Books, members and circulation test passed")
+    
+    # Test 18: CSV/JSONL import and export
+    print("\n18. Testing import and export...")
+    operations.borrow_book("M401", "401")
+    expected_books = {isbn: dict(book) for isbn, book in operations.books.items()}
+    expected_members = [dict(m, borrowed_books=list(m["borrowed_books"]))
+                        for m in operations.members]
+    with tempfile.TemporaryDirectory() as data_dir:
+        for extension in ("csv", "jsonl"):
+            books_path = os.path.join(data_dir, "books." + extension)
+            members_path = os.path.join(data_dir, "members." + extension)
+            assert import_export.export_books(books_path) == len(expected_books)
+            assert import_export.export_members(members_path) == len(expected_members)
+            operations.books.clear()
+            operations.members.clear()
+            operations.rebuild_indexes()
+            counts = import_export.import_books(books_path)
+            assert counts == {"OK.": len(expected_books)}
+            counts = import_export.import_members(members_path)
+            assert counts["OK."] == len(expected_members) and counts["Loan: OK."] == \
+                sum(len(m["borrowed_books"]) for m in expected_members)
+            assert operations.books == expected_books
+            assert list(operations.members) == expected_members
+        
+        # Existing members keep their loans; unknown books are counted
+        path = os.path.join(data_dir, "more.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"member_id":"M401","name":"Fay","email":"f@x","borrowed_books":["402"]}\n')
+            f.write('{"member_id":"M402","name":"Gus","email":"g@x","borrowed_books":["999"]}\n')
+        counts = import_export.import_members(path)
+        assert counts == {"Member already exists.": 1, "OK.": 1, "Loan: Book not found.": 1}
+        assert operations.find_member("M401")["borrowed_books"] == ["401"]
+        operations.delete_member("M402")
+    print(" import/export - CSV and JSONL round trip test passed")
+    
+    # Test 19: compact book records
+    print("\n19. Testing book records...")
+    book = operations.books["401"]
+    assert isinstance(book, operations.Book)
+    assert book["genre"] == "Fiction" and book.genre_code == 0
+    book["genre"] = "History"
+    assert operations.books["401"]["genre"] == "History"
+    assert dict(book) == {"title": "Bulk One", "author": "Feed", "genre": "History",
+                          "total_copies": 2, "available_copies": 1}
+    assert book == dict(book)
+    assert not hasattr(book, "__dict__")
+    try:
+        book["publisher"] = "Nobody"
+        assert False, "unknown field accepted"
+    except KeyError:
+        pass
+    print(" Book - Dict-style access test passed")
+    
+    # Test 20: asyncio server
+    print("\n20. Testing server...")
+    
+    async def pipelined_session():
+        library_server = server.LibraryServer()
+        tcp_server = await asyncio.start_server(library_server.handle_client, "127.0.0.1", 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        requests = [
+            {"id": 1, "op": "add_member", "args": ["M501", "Gus", "gus@example.com"]},
+            {"id": 2, "op": "borrow_book", "args": ["M501", "402"]},
+            {"id": 3, "op": "find_member", "args": ["M501"]},
+            {"id": 4, "op": "drop_tables"},
+        ]
+        writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+        writer.close()
+        await writer.wait_closed()
+        while library_server.open_connections:
+            await asyncio.sleep(0.01)
+        tcp_server.close()
+        await tcp_server.wait_closed()
+        return responses
+    
+    responses = asyncio.run(pipelined_session())
+    assert [r["id"] for r in responses] == [1, 2, 3, 4]
+    assert responses[1]["result"] == [True, "Book borrowed successfully."]
+    assert responses[2]["result"]["borrowed_books"] == ["402"]
+    assert "Unknown operation" in responses[3]["error"]
+    operations.return_book("M501", "402")
+    print(" LibraryServer - Pipelined requests test passed")
+    
+    async def oversized_session():
+        library_server = server.LibraryServer()
+        tcp_server = await asyncio.start_server(library_server.handle_client, "127.0.0.1", 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"x" * (server.MAX_PENDING + server.READ_SIZE))
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        closed = await reader.read() == b""
+        writer.close()
+        await writer.wait_closed()
+        tcp_server.close()
+        await tcp_server.wait_closed()
+        return response, closed
+    
+    response, closed = asyncio.run(oversized_session())
+    assert response == {"id": None, "error": "Request line too long"} and closed
+    print(" LibraryServer - Oversized request line test passed")
+    
+    with tempfile.TemporaryDirectory() as db_dir:
+        sqlite_repo = repository.open_repository("sqlite", os.path.join(db_dir, "server.db"))
+        for request in ({"id": 1, "op": "add_book", "args": ["S1", "Dune", "Herbert", "Fiction", 1]},
+                        {"id": 2, "op": "add_member", "args": ["S9", "Ida", "ida@example.com"]},
+                        {"id": 3, "op": "borrow_book", "args": ["S9", "S1"]}):
+            server.execute(json.dumps(request), sqlite_repo)
+        response, _ = server.execute(json.dumps({"id": 4, "op": "find_member", "args": ["S9"]}), sqlite_repo)
+        assert json.loads(response)["result"]["borrowed_books"] == ["S1"]
+        assert "S9" not in operations.members
+        response, _ = server.execute(json.dumps({"id": 5, "op": "place_hold", "args": ["S9", "S1"]}), sqlite_repo)
+        assert "Unknown operation" in json.loads(response)["error"]
+        sqlite_repo.close()
+    print(" LibraryServer - SQLite backend test passed")
+    
+    # Test 21: loan table
+    print("\n21. Testing loan table...")
+    operations.add_book("601", "Loan One", "Writer", "Fiction", 2)
+    operations.add_book("602", "Loan Two", "Writer", "Fiction", 1)
+    operations.add_member("M601", "Hal", "hal@example.com")
+    operations.add_member("M602", "Ivy", "ivy@example.com")
+    operations.borrow_book("M601", "601")
+    operations.borrow_book("M602", "601")
+    operations.borrow_book("M601", "602")
+    assert sorted(operations.holders_of("601")) == ["M601", "M602"]
+    assert sorted(operations.loans_of("M601")) == ["601", "602"]
+    operations.return_book("M601", "601")
+    assert operations.holders_of("601") == ["M602"]
+    assert operations.loans_of("M601") == ["602"]
+    assert operations.holders_of("999") == [] and operations.loans_of("M999") == []
+    operations.return_book("M602", "601")
+    operations.return_book("M601", "602")
+    assert operations.holders_of("601") == []
+    print(" holders_of()/loans_of() - Two-way loan index test passed")
+    
+    # Test 22: rendering
+    print("\n22. Testing rendering...")
+    
+    class CountingWriter(io.StringIO):
+        writes = 0
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+    
+    out = CountingWriter()
+    shown = render.show_books(operations.books, out=out, chunk_size=4)
+    assert shown == len(operations.books)
+    assert out.getvalue().count("ISBN: ") == len(operations.books)
+    assert out.writes <= len(operations.books) // 4 + 1
+    
+    out = CountingWriter()
+    pages = []
+    shown = render.show_books(operations.books, table=True, out=out, page_size=3,
+                              pause=lambda: pages.append(1) or len(pages) < 2)
+    assert shown == 6 and len(pages) == 2
+    assert out.getvalue().count("Available") == 2  # Header repeated per page
+    
+    out = CountingWriter()
+    operations.borrow_book("M601", "601")
+    render.show_members([operations.find_member("M601")], operations.books, out=out)
+    assert "    - 601: Loan One" in out.getvalue()
+    operations.return_book("M601", "601")
+    print(" render - Buffered and paged output test passed")
+    
+    # Test 23: instrumentation
+    print("\n23. Testing metrics...")
+    original_borrow = operations.borrow_book
+    metrics.enable()
+    try:
+        assert operations.borrow_book is not original_borrow
+        operations.borrow_book("M601", "601")
+        operations.borrow_book("M601", "601")
+        operations.borrow_book("M999", "601")
+        operations.return_book("M601", "601")
+        stats = metrics.snapshot()["borrow_book"]
+        assert stats["calls"] == 3
+        assert stats["outcomes"] == {"Book borrowed successfully.": 1,
+                                     "Member already has this book borrowed.": 1,
+                                     "Member not found.": 1}
+        assert stats["p99_seconds"] >= stats["p50_seconds"] > 0
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, "library.prom")
+            metrics.write_prometheus(path)
+            with open(path) as f:
+                text = f.read()
+        assert 'library_calls_total{op="borrow_book"} 3' in text
+        assert 'outcome="Member not found."} 1' in text
+    finally:
+        metrics.disable()
+        metrics.reset()
+    assert operations.borrow_book is original_borrow
+    print(" metrics - Snapshot and Prometheus dump test passed")
+    
+    # Test 24: search cache
+    print("\n24. Testing search cache...")
+    operations.search_cache.clear()
+    before = operations.search_cache_stats()
+    first = operations.search_books("loan")
+    operations.search_books("writer")
+    assert operations.search_books("loan") == first
+    stats = operations.search_cache_stats()
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["misses"] == before["misses"] + 2
+    assert stats["entries"] == 2
+    
+    # Availability changes show up without touching the cache
+    operations.borrow_book("M601", "601")
+    assert operations.search_books("loan")[0]["available_copies"] == 1
+    operations.return_book("M601", "601")
+    assert operations.search_cache_stats()["invalidations"] == stats["invalidations"]
+    
+    # A new title evicts only the keywords it contains
+    operations.add_book("701", "Loan Three", "Someone Else", "Fiction", 1)
+    stats = operations.search_cache_stats()
+    assert stats["entries"] == 1  # "writer" survives
+    assert [b["isbn"] for b in operations.search_books("loan")] == ["601", "602", "701"]
+    operations.update_book("701", title="Renamed")
+    assert [b["isbn"] for b in operations.search_books("loan")] == ["601", "602"]
+    operations.delete_book("701")
+    
+    small = operations.SearchCache(max_entries=2)
+    for keyword in ("a", "b", "c"):
+        small.put((keyword, False), ["x"], small.generation)
+    assert small.stats()["entries"] == 2 and small.stats()["evictions"] == 1
+    assert small.get(("a", False)) is None
+    
+    # delete_book unindexes a book before removing it; a search in between skips it
+    operations.add_book("702", "Halfway Gone", "Writer", "Fiction", 1)
+    del operations._book_order["702"]
+    assert operations.search_books("halfway gone") == []
+    assert operations.search_books_page("halfway gone", ranked=True) == ([], None)
+    operations.delete_book("702")
+    print(" search_books() - Cache hits and precise invalidation test passed")
+    
+    # Test 25: facets
+    print("\n25. Testing facets...")
+    
+    def expected_filter(genre=None, author=None, available=None, min_copies=None):
+        return [isbn for isbn, book in operations.books.items()
+                if (genre is None or book["genre"] == genre)
+                and (author is None or book["author"].lower() == author.lower())
+                and (available is None or (book["available_copies"] > 0) == available)
+                and (min_copies is None or book["total_copies"] >= min_copies)]
+    
+    def check_facets():
+        for genre in operations.genres + (None,):
+            for available in (None, True, False):
+                got = [b["isbn"] for b in operations.filter_books(genre=genre, available=available)]
+                assert got == expected_filter(genre=genre, available=available)
+        counts = operations.genre_counts()
+        available_counts = operations.genre_counts(available=True)
+        for genre in operations.genres:
+            assert counts[genre] == len(expected_filter(genre=genre))
+            assert available_counts[genre] == len(expected_filter(genre=genre, available=True))
+    
+    operations.rebuild_indexes()  # Test 19 edited a record behind the indexes' back
+    check_facets()
+    operations.add_book("801", "Dune", "Frank Herbert", "Sci-Fi", 1)
+    operations.add_book("802", "Dune Messiah", "Frank Herbert", "Sci-Fi", 3)
+    check_facets()
+    operations.borrow_book("M601", "801")  # Last copy leaves the shelf
+    check_facets()
+    got = operations.filter_books(genre="Sci-Fi", author="frank herbert", available=True)
+    assert [b["isbn"] for b in got] == ["802"]
+    got = operations.filter_books(author="Frank Herbert", min_copies=2, max_copies=3)
+    assert [b["isbn"] for b in got] == ["802"]
+    operations.update_book("802", genre="Fiction", author="F. Herbert")
+    check_facets()
+    assert operations.filter_books(author="Frank Herbert", available=True) == []
+    operations.return_book("M601", "801")
+    operations.delete_book("801")
+    check_facets()
+    assert operations.filter_books(genre="Poetry") == []
+    print(" filter_books()/genre_counts() - Facet maintenance test passed")
+    
+    # Test 26: sharded catalog
+    print("\n26. Testing sharded catalog...")
+    rng = random.Random(26)
+    words = ["Zephyr", "Quill", "Ymir", "Zest", "Quartz"]
+    rows = [(f"S{i:03d}", f"{rng.choice(words)} {rng.choice(words)}",
+             rng.choice(["Zora Quill", "Yves Zephyrine"]), rng.choice(operations.genres), 2)
+            for i in range(60)]
+    rows.append(("S000", "Duplicate", "Nobody", "Fiction", 1))
+    rows.append(("S999", "Bad Genre", "Nobody", "Cookbooks", 1))
+    rows.append({"isbn": "S998", "title": "Quill Dict", "author": "Zora Quill",
+                 "genre": "Fiction", "total_copies": 1})  # As from csv.DictReader
+    rows.append(("S997", "Too Short"))
+    
+    def catalog_only(results):
+        # Shards don't see circulation, so their results carry no availability
+        return [{k: v for k, v in r.items() if k != "available_copies"} for r in results]
+    
+    def same_searches(catalog):
+        for keyword in ["zephyr", "qu", "z", "ymir zest", "yves", "nothing"]:
+            for ranked in (False, True):
+                assert catalog.search_books(keyword, ranked) == \
+                    catalog_only(operations.iter_search_books(keyword, ranked))
+                cursor, expected_cursor = None, None
+                while True:
+                    page = catalog.search_books_page(keyword, 7, cursor, ranked)
+                    expected = operations.search_books_page(keyword, 7, expected_cursor, ranked)
+                    assert page == (catalog_only(expected[0]), expected[1])
+                    cursor = expected_cursor = page[1]
+                    if cursor is None:
+                        break
+    
+    with sharded.ShardedCatalog(shards=3) as catalog:
+        assert list(catalog.add_books_bulk(rows)) == list(operations.add_books_bulk(rows))
+        assert catalog.book_count() == 61
+        same_searches(catalog)
+        for isbn in ["S001", "S017", "S042"]:
+            assert catalog.update_book(isbn, title="Quartz Zenith") == \
+                operations.update_book(isbn, title="Quartz Zenith")
+        assert catalog.delete_book("S005") == operations.delete_book("S005")
+        assert catalog.delete_book("S005") == (False, "Book not found.")
+        assert catalog.add_book("S005", "Ymir Returns", "Zora Quill", "Fiction", 1) == \
+            operations.add_book("S005", "Ymir Returns", "Zora Quill", "Fiction", 1)
+        same_searches(catalog)
+    for row in rows[:60]:
+        operations.delete_book(row[0])
+    operations.delete_book("S998")
+    print(" ShardedCatalog - Results match the single-process catalog test passed")
+    
+    # Test 27: mmap catalog snapshot
+    print("\n27. Testing catalog snapshot...")
+    operations.add_book("901", "Ætherwïnd Chronicles", "Zoë Ångström", "Fiction", 2)
+    operations.borrow_book("M601", "901")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.bin")
+        assert catalog_snapshot.build_snapshot(path) == len(operations.books)
+        assert catalog_snapshot.verify_snapshot(path, operations.books) == []
+        # Two readers of one file, as separate processes would open it
+        with catalog_snapshot.open_snapshot(path) as first, \
+                catalog_snapshot.open_snapshot(path) as second:
+            assert len(first) == len(operations.books)
+            assert list(first.isbns()) == list(operations.books)
+            for isbn, book in operations.books.items():
+                assert isbn in second and second.get(isbn) == dict(book)
+            assert "missing" not in first and first.get("missing") is None
+            for keyword in ["python", "ÅNG", "wïnd", "o", "", "no such book"]:
+                for ranked in (False, True):
+                    assert list(first.iter_search_books(keyword, ranked)) == \
+                        list(operations.iter_search_books(keyword, ranked))
+                assert second.search_books_page(keyword, 2, "2", True) == \
+                    operations.search_books_page(keyword, 2, "2", True)
+        with open(path, "r+b") as f:
+            f.seek(-5, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-5, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 1]))
+        assert catalog_snapshot.verify_snapshot(path) == ["checksum mismatch"]
+        operations.update_book("901", total_copies=3)
+        catalog_snapshot.build_snapshot(path)
+        assert catalog_snapshot.verify_snapshot(path, operations.books) == []
+    operations.return_book("M601", "901")
+    assert catalog_snapshot.verify_snapshot(path + ".gone") != []
+    print(" catalog_snapshot - mmap lookups and searches match the live catalog test passed")
+    
+    # Test 28: due dates, holds and overdue sweeps
+    print("\n28. Testing due dates and holds...")
+    now = [1000.0]
+    real_clock = operations.clock
+    operations.clock = lambda: now[0]
+    period = operations.LOAN_PERIOD
+    operations.add_book("1001", "Waitlisted", "Popular Author", "Fiction", 1)
+    operations.add_book("1002", "Short Loan", "Popular Author", "Fiction", 2)
+    for member_id in ("M1001", "M1002", "M1003"):
+        operations.add_member(member_id, "Reader " + member_id, member_id + "@example.com")
+    assert operations.borrow_book("M1001", "1001")[0]
+    assert operations.due_date("M1001", "1001") == 1000 + period
+    assert operations.place_hold("M1002", "1002") == \
+        (False, "Copies are available - borrow the book instead.")
+    assert operations.place_hold("M1001", "1001") == (False, "Member already has this book borrowed.")
+    assert operations.place_hold("M1002", "1001") == (True, "Hold placed (position 1).")
+    assert operations.place_hold("M1003", "1001") == (True, "Hold placed (position 2).")
+    assert not operations.place_hold("M1003", "1001")[0]
+    assert operations.holds_for("1001") == ["M1002", "M1003"]
+    
+    # A return goes straight to the first member in line
+    now[0] = 2000.0
+    assert operations.return_book("M1001", "1001")[0]
+    assert operations.loans_of("M1002") == ["1001"]
+    assert operations.holds_for("1001") == ["M1003"]
+    assert operations.due_date("M1002", "1001") == 2000 + period
+    assert operations.due_date("M1001", "1001") is None
+    assert operations.cancel_hold("M1003", "1001") == (True, "Hold cancelled.")
+    assert operations.holds_for("1001") == []
+    
+    # Members at their limit keep their place; the next in line is served
+    operations.place_hold("M1003", "1001")
+    operations.place_hold("M1001", "1001")
+    assert operations.borrow_book("M1003", "1002", due=500.0)[0]
+    for isbn in ("101", "601"):
+        operations.borrow_book("M1003", isbn)
+    assert len(operations.loans_of("M1003")) == 3
+    operations.return_book("M1002", "1001")
+    assert operations.loans_of("M1001") == ["1001"]
+    assert operations.holds_for("1001") == ["M1003"]
+    
+    # Upcoming and overdue loans come off the heap in due order
+    # Equal due times are ordered by member ID, then ISBN
+    assert operations.next_due(2) == [("M1003", "1002", 500.0), ("M1001", "1001", 2000 + period)]
+    assert operations.sweep_overdue(now=400.0) == []
+    swept = operations.sweep_overdue(now=2000 + period, batch_size=1)
+    assert [(m, i) for m, i, _ in swept] == [("M1003", "1002"), ("M1001", "1001"),
+                                             ("M1003", "101"), ("M1003", "601")]
+    assert operations.sweep_overdue(now=2000 + period) == []
+    assert operations.overdue_loans(1) == [("M1003", "1002", 500.0)]
+    operations.return_book("M1003", "1002")
+    assert ("M1003", "1002", 500.0) not in operations.overdue_loans()
+    
+    operations.return_book("M1003", "101")
+    operations.return_book("M1003", "601")
+    operations.return_book("M1001", "1001")  # Hands the copy to M1003
+    operations.return_book("M1003", "1001")
+    assert operations.overdue_loans() == []
+    
+    # Due dates, overdue marks and holds survive a snapshot plus log replay
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = storage.open_storage(data_dir)  # Starts from an empty library
+        operations.add_book("1101", "Persisted", "Writer", "Fiction", 1)
+        operations.add_book("1102", "Late Return", "Writer", "Fiction", 1)
+        operations.add_member("M1101", "Ivy", "ivy@example.com")
+        operations.add_member("M1102", "Jon", "jon@example.com")
+        operations.borrow_book("M1101", "1101", due=100.0)
+        operations.borrow_book("M1101", "1102", due=150.0)
+        operations.place_hold("M1102", "1101")
+        assert len(operations.sweep_overdue(now=200.0)) == 2
+        store.snapshot()
+        now[0] = 4000.0
+        operations.return_book("M1101", "1101")  # Logged; hands the copy to M1102
+        operations.place_hold("M1101", "1101")
+        store.close()
+        now[0] = 9000.0
+        store = storage.open_storage(data_dir)
+        assert operations.loans_of("M1102") == ["1101"]
+        assert operations.due_date("M1102", "1101") == 4000 + period
+        assert operations.holds_for("1101") == ["M1101"]
+        assert operations.overdue_loans() == [("M1101", "1102", 150.0)]
+        store.close()
+    operations.clock = real_clock
+    print(" Due dates, hold queues and overdue sweeps test passed")
+    
+    # Test 29: transactions
+    print("\n29. Testing transactions...")
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = storage.open_storage(data_dir)  # Starts from an empty library
+        operations.add_book("1201", "Desk One", "Writer", "Fiction", 2)
+        operations.add_book("1202", "Desk Two", "Writer", "Fiction", 1)
+        operations.add_book("1203", "Desk Three", "Writer", "Fiction", 1)
+        operations.add_book("1204", "Desk Four", "Writer", "Fiction", 1)
+        operations.add_member("M1201", "Kim", "kim@example.com")
+        operations.add_member("M1202", "Lee", "lee@example.com")
+        
+        with operations.transaction() as tx:
+            for isbn in ("1201", "1202", "1203"):
+                tx.borrow_book("M1201", isbn)
+        assert tx.result == (True, "Transaction committed (3 steps).")
+        assert sorted(operations.loans_of("M1201")) == ["1201", "1202", "1203"]
+        
+        def library_state():
+            return ({isbn: dict(book) for isbn, book in operations.books.items()},
+                    [dict(member, borrowed_books=list(member["borrowed_books"]))
+                     for member in operations.members])
+        
+        # Borrowing a fourth book before returning one breaks the limit
+        before = library_state()
+        with operations.transaction() as tx:
+            tx.borrow_book("M1201", "1204")
+            tx.return_book("M1201", "1203")
+            tx.borrow_book("M1202", "1202")
+        assert tx.result == (False, "Step 1 (borrow M1201 1204): Borrow limit reached. "
+                                    "Nothing was applied.")
+        assert list(tx.statuses) == [operations.STATUS_LIMIT_REACHED, operations.STATUS_OK,
+                                     operations.STATUS_NO_COPIES]
+        assert library_state() == before
+        
+        # The same steps in a workable order, seeing each other's effects
+        with operations.transaction() as tx:
+            tx.return_book("M1201", "1203")
+            tx.borrow_book("M1201", "1204")
+            tx.return_book("M1201", "1202")
+            tx.borrow_book("M1202", "1202")
+            tx.borrow_book("M1202", "1203")
+        assert tx.result[0], tx.result
+        assert sorted(operations.loans_of("M1201")) == ["1201", "1204"]
+        assert sorted(operations.loans_of("M1202")) == ["1202", "1203"]
+        
+        # An exception in the block discards the staged steps
+        try:
+            with operations.transaction() as tx:
+                tx.return_book("M1202", "1202")
+                raise RuntimeError("desk closed")
+        except RuntimeError:
+            pass
+        assert tx.result is None and "1202" in operations.loans_of("M1202")
+        
+        # Returns inside a transaction still serve the hold queue
+        operations.place_hold("M1201", "1203")
+        result = operations.apply_transaction([("return", "M1202", "1203"),
+                                               ("return", "M1202", "1202")])
+        assert result == (True, "Transaction committed (2 steps).")
+        assert sorted(operations.loans_of("M1201")) == ["1201", "1203", "1204"]
+        assert operations.apply_transaction([("renew", "M1201", "1201")])[0] is False
+        assert operations.apply_transaction([("borrow", "M1201")])[0] is False
+        
+        # One log record per transaction, replayed as a unit
+        expected = library_state()
+        due = operations.due_date("M1201", "1204")
+        store.close()
+        with open(os.path.join(data_dir, storage.WAL_FILE), encoding="utf-8") as f:
+            ops = [json.loads(line)[0] for line in f]
+        assert ops.count("apply_transaction") == 3
+        store = storage.open_storage(data_dir)
+        assert library_state() == expected
+        assert operations.due_date("M1201", "1204") == due
+        store.close()
+    print(" transaction() - All-or-nothing commit test passed")
+    
+    # Test 30: fuzzy search
+    print("\n30. Testing fuzzy search...")
+    operations.add_book("1301", "Python Crash Course", "Jane Smith", "Non-Fiction", 1)
+    operations.add_book("1302", "Gardening Basics", "John Smyth", "Non-Fiction", 1)
+    operations.add_book("1303", "Janes Garden", "Mary Jones", "Fiction", 1)
+    
+    def fuzzy(query, **options):
+        return [b["isbn"] for b in operations.fuzzy_search_books(query, **options)]
+    
+    assert operations.search_books("Jnae Smith") == []
+    assert fuzzy("Jnae Smith") == ["1301"]  # Swapped letters are one edit
+    assert fuzzy("pyhton crash") == ["1301"]
+    assert fuzzy("smith") == ["1301", "1302"]  # Exact match first
+    assert fuzzy("jane") == ["1301", "1303"]
+    assert fuzzy("gardning") == ["1302"]
+    assert fuzzy("gardn") == ["1303"]
+    assert fuzzy("gardning", max_distance=0) == []
+    assert fuzzy("jo") == []  # Two-letter words must match exactly
+    assert fuzzy("smith", limit=1) == ["1301"]
+    assert fuzzy("") == [] and fuzzy("qqqqqq") == []
+    assert operations.fuzzy_search_books("Jnae Smith")[0] == operations.search_books("Python Crash")[0]
+    
+    # add/update/delete keep the word dictionary current
+    operations.update_book("1301", author="Janet Smithers")
+    assert fuzzy("Jnae Smith") == []
+    assert fuzzy("janet smithres") == ["1301"]
+    operations.delete_book("1302")
+    assert fuzzy("smyth") == []
+    assert "smyth" not in operations._word_books
+    assert all("smyth" not in filed for filed in operations._word_variants.values())
+    operations.rebuild_indexes()
+    assert fuzzy("janet smithres") == ["1301"]
+    
+    for a, b, distance in [("jnae", "jane", 1), ("kitten", "sitting", 3), ("abc", "abc", 0),
+                           ("", "ab", 2), ("ca", "abc", 3)]:
+        assert operations._edit_distance(a, b, 5) == distance
+        if distance:
+            # Past the limit the answer is just limit + 1
+            assert operations._edit_distance(a, b, distance - 1) == distance
+    print(" fuzzy_search_books() - Typo-tolerant search test passed")
+    
+    # Test 31: change events
+    print("\n31. Testing change events...")
+    start = operations.change_log.last_seq
+    operations.add_book("1401", "Evented", "Writer", "History", 1)
+    operations.add_member("M1401", "Max", "max@example.com")
+    operations.add_member("M1402", "Nia", "nia@example.com")
+    assert not operations.borrow_book("M9999", "1401")[0]  # Failures emit nothing
+    operations.borrow_book("M1401", "1401", due=123.0)
+    operations.place_hold("M1402", "1401")
+    operations.cancel_hold("M1402", "1401")
+    operations.apply_transaction([("return", "M1401", "1401"), ("borrow", "M1402", "1401", 456.0)])
+    operations.return_book("M1402", "1401")
+    operations.update_book("1401", title="Evented Again")
+    operations.update_book("1401", genre="Poetry", colour="red")  # Nothing applied, no events
+    operations.update_member("M1402", email="nia@example.org", shoe_size=9)
+    operations.update_member("M1402", shoe_size=9)
+    operations.delete_book("1401")
+    operations.delete_member("M1402")
+    events = operations.change_log.read(start)
+    assert [event.seq for event in events] == list(range(start + 1, start + 14))
+    assert [(event.type, event.key) for event in events] == [
+        ("book_added", "1401"), ("member_added", "M1401"), ("member_added", "M1402"),
+        ("book_borrowed", "1401"), ("hold_placed", "1401"), ("hold_cancelled", "1401"),
+        ("book_returned", "1401"), ("book_borrowed", "1401"), ("book_returned", "1401"),
+        ("book_updated", "1401"), ("member_updated", "M1402"), ("book_deleted", "1401"),
+        ("member_deleted", "M1402")]
+    assert events[3].data == {"member_id": "M1401", "due": 123.0}
+    assert events[7].data == {"member_id": "M1402", "due": 456.0}
+    assert events[9].data == {"title": "Evented Again"}
+    assert events[10].data == {"email": "nia@example.org"}
+    assert {event.type for event in events} <= set(operations.EVENT_TYPES)
+    assert operations.change_log.read(start, limit=2) == events[:2]
+    assert operations.read_changes(start + 12) == [events[12]._asdict()]
+    
+    # A small ring keeps only the newest events; readers can see the gap
+    ring = operations.ChangeLog(capacity=4)
+    for i in range(6):
+        ring.record("delete_book", (f"R{i}",), {})
+    assert [event.seq for event in ring.read(0)] == [3, 4, 5, 6]
+    assert ring.first_seq == 3 and ring.read(6) == []
+    
+    # Subscribers are woken by new events
+    received = []
+    def consume():
+        for event in ring.subscribe(after=6, timeout=5):
+            received.append(event.key)
+            if len(received) == 2:
+                break
+    reader = threading.Thread(target=consume)
+    reader.start()
+    ring.record("delete_book", ("R6",), {})
+    ring.record("delete_book", ("R7",), {})
+    reader.join()
+    assert received == ["R6", "R7"]
+    assert list(ring.subscribe(after=8, timeout=0.01)) == []
+    
+    # The file sink keeps events across restarts, continuing the numbering
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.jsonl")
+        first = operations.ChangeLog()
+        first.open_sink(path)
+        first.record("add_member", ("M1", "A", "a@example.com"), {})
+        first.record("delete_member", ("M1",), {})
+        first.close_sink()
+        second = operations.ChangeLog()
+        second.open_sink(path)
+        second.record("delete_book", ("X",), {})
+        second.close_sink()
+        from_file = list(operations.read_event_file(path, after=1))
+        assert [(event.seq, event.type) for event in from_file] == \
+            [(2, "member_deleted"), (3, "book_deleted")]
+        assert from_file[0] == first.read(1)[0]
+    print(" ChangeLog - Sequenced events, ring buffer and file sink test passed")
+    
+    print("\n32. Testing circulation statistics...")
+    def recomputed():
+        # What each report used to work out from scratch
+        stats = {genre: [0, 0] for genre in operations.genres}
+        for book in operations.books.values():
+            stats[book["genre"]][0] += book["total_copies"]
+            stats[book["genre"]][1] += book["total_copies"] - book["available_copies"]
+        return stats
+    def check_genres():
+        stats = operations.circulation_stats()
+        for genre, (copies, on_loan) in recomputed().items():
+            assert stats["genres"][genre]["copies"] == copies
+            assert stats["genres"][genre]["on_loan"] == on_loan
+        assert stats["on_loan"] == sum(g["on_loan"] for g in stats["genres"].values())
+    operations.rebuild_indexes()
+    check_genres()
+    operations.add_book("1501", "Counted", "Tally", "Biography", 4)
+    operations.add_book("1502", "Also Counted", "Tally", "Biography", 2)
+    for member_id in ("M1501", "M1502", "M1503"):
+        operations.add_member(member_id, "Reader " + member_id, member_id + "@example.com")
+    for member_id in ("M1501", "M1502", "M1503"):
+        operations.borrow_book(member_id, "1501")
+        operations.return_book(member_id, "1501")
+        operations.borrow_book(member_id, "1501")
+    operations.borrow_book("M1501", "1502")
+    operations.apply_transaction([("borrow", "M1502", "1502")])
+    check_genres()
+    biography = operations.circulation_stats()["genres"]["Biography"]
+    assert biography["on_loan"] >= 5 and 0 < biography["utilization"] <= 1
+    assert ("1501", 6) in operations.most_borrowed(100)
+    assert ("1502", 2) in operations.most_borrowed(100)
+    assert ("M1501", 3) in operations.most_active_members(100)
+    operations.update_book("1501", total_copies=6)
+    check_genres()
+    for member_id in ("M1501", "M1502", "M1503"):
+        operations.return_book(member_id, "1501")
+    operations.return_book("M1501", "1502")
+    operations.return_book("M1502", "1502")
+    operations.delete_book("1501")
+    operations.delete_member("M1503")
+    check_genres()
+    assert "1501" not in dict(operations.most_borrowed(100))
+    assert "M1503" not in dict(operations.most_active_members(100))
+    
+    # The leaderboard keeps the right top entries as counts grow and keys leave
+    board = operations.Leaderboard(size=3)
+    expected = {}
+    for i, key in enumerate("abcadbeeefaaffffg"):
+        board.increment(key)
+        expected[key] = expected.get(key, 0) + 1
+        if i == 10:
+            board.remove("a")
+            del expected["a"]
+        best = sorted(expected.values(), reverse=True)[:3]
+        assert [count for _, count in board.top()] == best
+    assert board.top(2) == [("f", 5), ("e", 3)]
+    rng = random.Random(32)
+    board, expected = operations.Leaderboard(size=4), {}
+    for _ in range(2000):
+        key = f"k{rng.randrange(25)}"
+        if rng.random() < 0.1:
+            board.remove(key)
+            expected.pop(key, None)
+        else:
+            board.increment(key)
+            expected[key] = expected.get(key, 0) + 1
+        assert all(expected[key] == count for key, count in board.top())
+        assert [count for _, count in board.top()] == sorted(expected.values(), reverse=True)[:4]
+    
+    # Lifetime counts survive a restart through storage
+    state = operations.stats_state()
+    operations.restore_stats({"books": {"X1": 2}, "members": {}})
+    assert operations.most_borrowed() == [("X1", 2)]
+    operations.restore_stats(state)
+    assert operations.stats_state() == state
+    
+    # Counts of books and members that are gone are dropped on a rebuild
+    operations.restore_stats({"books": {"1502": 2, "gone": 5}, "members": {"M1501": 3, "Mgone": 4}})
+    operations.rebuild_indexes()
+    assert operations.most_borrowed() == [("1502", 2)]
+    assert operations.most_active_members() == [("M1501", 3)]
+    operations.restore_stats(state)
+    print(" Statistics - Incremental counters and leaderboards test passed")
+    
+    print("\n33. Testing demo script mode...")
+    script = [
+        "# comments and blank lines are skipped",
+        "",
+        'add_book 1601 "Scripted Book" "Script Author" Fiction 1',
+        "add_member M1601 Sam sam@example.com",
+        "borrow_book M1601 1601",
+        "borrow_book M1601 1601",
+        "update_book 1601 total_copies=2",
+        "search_books scripted",
+        "no_such_command 1",
+        "add_book 1602 missing arguments",
+        "return_book M1601 1601",
+    ]
+    out = io.StringIO()
+    stderr, sys.stderr = sys.stderr, io.StringIO()
+    try:
+        counts = demo.run_script(script, out=out)
+        errors = sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+    assert (counts["commands"], counts["succeeded"], counts["failed"], counts["errors"]) == (9, 6, 1, 2)
+    lines = out.getvalue().splitlines()
+    assert lines[:4] == ["Book added successfully.", "Member added successfully.",
+                         "Book borrowed successfully.", "No copies available."]
+    assert lines[5].startswith("1601") and "Scripted Book" in lines[5] and lines[5].endswith("1/2")
+    assert "line 9:" in errors and "line 10:" in errors
+    assert operations.books["1601"]["available_copies"] == 2
+    assert demo.parse_command("update_book 1 title='A = B' total_copies=4") == \
+        ("update_book", ["1"], {"title": "A = B", "total_copies": 4})
+    assert demo.parse_command("add_book 7 C#Basics Ann Tech 1  # trailing note") == \
+        ("add_book", ["7", "C#Basics", "Ann", "Tech", 1], {})
+    assert demo.parse_command("add_member M7 Bob bob#1@x.com") == \
+        ("add_member", ["M7", "Bob", "bob#1@x.com"], {})
+    assert demo.parse_command("update_book 7 title='No # here'") == \
+        ("update_book", ["7"], {"title": "No # here"})
+    assert demo.parse_command("   # whole-line comment") is None
+    quiet = io.StringIO()
+    demo.run_script(["delete_book 1601", "delete_member M1601"], out=quiet, quiet=True)
+    assert quiet.getvalue() == "" and "1601" not in operations.books
+    print(" Demo - Scripted commands with summary counters test passed")
+    
     print("\n" + "=" * 50)
     print("🎉 ALL TESTS PASSED SUCCESSFULLY!")
     print("=" * 50)